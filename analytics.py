@@ -0,0 +1,233 @@
+import numpy as np
+from datetime import datetime
+
+
+TIMESTAMP_WIDTH = 22  # %Y%m%d_%H%M%S_%f
+TIMESTAMP_WEIGHTS = {
+    'year': (slice(0, 4), [1000, 100, 10, 1]),
+    'month': (slice(4, 6), [10, 1]),
+    'day': (slice(6, 8), [10, 1]),
+    'hour': (slice(9, 11), [10, 1]),
+    'minute': (slice(11, 13), [10, 1]),
+    'second': (slice(13, 15), [10, 1]),
+    'microsecond': (slice(16, 22), [100000, 10000, 1000, 100, 10, 1]),
+}
+
+
+def parse_timestamp(timestamp):
+    """Parse one violation timestamp (%Y%m%d_%H%M%S_%f, or ISO 8601) without going through strptime."""
+    if len(timestamp) == TIMESTAMP_WIDTH and timestamp[8] == '_' and timestamp[15] == '_':
+        return datetime(int(timestamp[0:4]), int(timestamp[4:6]), int(timestamp[6:8]),
+                        int(timestamp[9:11]), int(timestamp[11:13]), int(timestamp[13:15]),
+                        int(timestamp[16:22]))
+    try:
+        return datetime.strptime(timestamp, "%Y%m%d_%H%M%S_%f")
+    except ValueError:
+        return datetime.fromisoformat(timestamp)
+
+
+def parse_timestamps(timestamps):
+    """
+    Parse a list of violation timestamps into a datetime64[us] array.
+
+    Well-formed %Y%m%d_%H%M%S_%f strings are decoded with array arithmetic on
+    their code points; anything else, including fields out of range for a
+    calendar date, falls back to parse_timestamp, and unparseable values
+    become NaT, exactly as parse_timestamp would reject them.
+    """
+    result = np.full(len(timestamps), np.datetime64('NaT'), dtype='datetime64[us]')
+    if not len(timestamps):
+        return result
+
+    text = np.asarray(timestamps, dtype=str)
+    fixed = np.char.str_len(text) == TIMESTAMP_WIDTH
+    digits = text[fixed].astype(f'U{TIMESTAMP_WIDTH}').view(np.uint32).reshape(-1, TIMESTAMP_WIDTH).astype(np.int64) - ord('0')
+
+    separators = (digits[:, 8] == ord('_') - ord('0')) & (digits[:, 15] == ord('_') - ord('0'))
+    number_columns = np.r_[0:8, 9:15, 16:22]
+    valid = separators & np.all((digits[:, number_columns] >= 0) & (digits[:, number_columns] <= 9), axis=1)
+
+    fields = {name: digits[valid, columns] @ weights for name, (columns, weights) in TIMESTAMP_WEIGHTS.items()}
+    months = ((fields['year'] - 1970) * 12 + fields['month'] - 1).astype('datetime64[M]')
+    month_days = ((months + 1).astype('datetime64[D]') - months.astype('datetime64[D]')).astype(np.int64)
+    # Without this, e.g. month 13 or 31 February would silently roll over into the next month
+    in_range = (
+        (fields['year'] >= 1) & (fields['month'] >= 1) & (fields['month'] <= 12)
+        & (fields['day'] >= 1) & (fields['day'] <= month_days)
+        & (fields['hour'] <= 23) & (fields['minute'] <= 59) & (fields['second'] <= 59)
+    )
+    fields = {name: values[in_range] for name, values in fields.items()}
+    months = months[in_range]
+    days = months.astype('datetime64[D]') + (fields['day'] - 1).astype('timedelta64[D]')
+    micros = ((fields['hour'] * 60 + fields['minute']) * 60 + fields['second']) * 1000000 + fields['microsecond']
+
+    fast = np.flatnonzero(fixed)[valid][in_range]
+    result[fast] = days.astype('datetime64[us]') + micros.astype('timedelta64[us]')
+
+    slow = np.ones(len(timestamps), dtype=bool)
+    slow[fast] = False
+    for index in np.flatnonzero(slow):
+        try:
+            result[index] = np.datetime64(parse_timestamp(timestamps[index]), 'us')
+        except (TypeError, ValueError):
+            pass
+    return result
+
+
+def to_seconds(times):
+    """datetime64 array -> float seconds since the epoch (NaT -> nan)."""
+    return (times - np.datetime64(0, 'us')) / np.timedelta64(1, 's')
+
+
+class TypeCodes:
+    """Maps violation type names to small integer codes, known severity types first."""
+
+    def __init__(self, severity_map):
+        self.severity_map = severity_map
+        self.index = {name: code for code, name in enumerate(severity_map)}
+
+    def encode(self, violations):
+        index = self.index
+        return np.fromiter((index.setdefault(v['type'], len(index)) for v in violations),
+                           dtype=np.int16, count=len(violations))
+
+    @property
+    def names(self):
+        return list(self.index)
+
+    def severity_table(self):
+        return np.array([self.severity_map.get(name, 1) for name in self.index], dtype=np.int16)
+
+
+class ViolationColumns:
+    """
+    Columnar view of one violation log: integer type codes, epoch-second
+    timestamps and severities in NumPy arrays, so stats and histograms are
+    computed without walking the list of dicts again.
+    """
+
+    def __init__(self, violations, severity_map):
+        codes = TypeCodes(severity_map)
+        self.timestamps = [v['timestamp'] for v in violations]
+        self.types = codes.encode(violations)
+        self.type_names = codes.names
+        self.severities = codes.severity_table()[self.types]
+        self.times = to_seconds(parse_timestamps(self.timestamps))
+
+    def __len__(self):
+        return len(self.types)
+
+    def counts(self):
+        """Violations per type, for types that occur."""
+        counts = np.bincount(self.types, minlength=len(self.type_names))
+        return {self.type_names[code]: int(count) for code, count in enumerate(counts) if count}
+
+    def stats(self):
+        """Same shape as the original ReportGenerator.calculate_stats output."""
+        total = len(self)
+        severity_score = int(self.severities.sum())
+        names = self.type_names
+        return {
+            'total': total,
+            'by_type': self.counts(),
+            'timeline': [
+                {'time': t, 'type': names[code], 'severity': severity}
+                for t, code, severity in zip(self.timestamps, self.types.tolist(), self.severities.tolist())
+            ],
+            'severity_score': severity_score,
+            'average_severity': (severity_score / total) if total else 0,
+        }
+
+    def duration(self):
+        """Seconds between the first and last violation."""
+        times = self.times[~np.isnan(self.times)]
+        return float(times.max() - times.min()) if len(times) else 0.0
+
+    def window_counts(self, window=60):
+        """For each violation (in time order), how many violations fall in the `window` seconds ending at it."""
+        times = np.sort(self.times[~np.isnan(self.times)])
+        return np.arange(1, len(times) + 1) - np.searchsorted(times, times - window, side='right')
+
+    def peak_rate(self, window=60):
+        """Highest number of violations seen in any `window`-second span."""
+        counts = self.window_counts(window)
+        return int(counts.max()) if len(counts) else 0
+
+    def per_minute(self, by_type=False):
+        """
+        Violations per minute since the first one. With by_type, returns a
+        (minutes, types) matrix whose columns follow `type_names`.
+        """
+        mask = ~np.isnan(self.times)
+        times = self.times[mask]
+        if not len(times):
+            return np.zeros((0, len(self.type_names)) if by_type else 0, dtype=np.int64)
+
+        minutes = ((times - times.min()) // 60).astype(np.int64)
+        bins = int(minutes.max()) + 1
+        if not by_type:
+            return np.bincount(minutes, minlength=bins)
+
+        ntypes = len(self.type_names)
+        cells = np.bincount(minutes * ntypes + self.types[mask], minlength=bins * ntypes)
+        return cells.reshape(bins, ntypes)
+
+
+class CohortAnalytics:
+    """
+    Analytics across every student of an exam at once: all logs are stacked
+    into one set of columns with a student index, and per-student figures come
+    from a handful of bincounts instead of one pass per student.
+    """
+
+    def __init__(self, logs, severity_map):
+        """logs: {student_id: [violation, ...]}"""
+        self.student_ids = list(logs)
+        lengths = np.array([len(logs[s]) for s in self.student_ids], dtype=np.int64)
+        violations = [v for s in self.student_ids for v in logs[s]]
+
+        codes = TypeCodes(severity_map)
+        self.students = np.repeat(np.arange(len(self.student_ids)), lengths)
+        self.types = codes.encode(violations)
+        self.type_names = codes.names
+        self.severities = codes.severity_table()[self.types]
+        self.times = to_seconds(parse_timestamps([v['timestamp'] for v in violations]))
+
+    def summary(self, window=60):
+        """Per-student totals, severity, type counts and peak per-minute rate, most severe first."""
+        nstudents, ntypes = len(self.student_ids), len(self.type_names)
+        totals = np.bincount(self.students, minlength=nstudents)
+        scores = np.bincount(self.students, weights=self.severities, minlength=nstudents)
+        by_type = np.bincount(self.students * ntypes + self.types, minlength=nstudents * ntypes).reshape(nstudents, ntypes)
+
+        # Peak rate per student: fixed `window`-second bins across the whole exam
+        peaks = np.zeros(nstudents, dtype=np.int64)
+        mask = ~np.isnan(self.times)
+        if mask.any():
+            times = self.times[mask]
+            bins = ((times - times.min()) // window).astype(np.int64)
+            nbins = int(bins.max()) + 1
+            cells = np.bincount(self.students[mask] * nbins + bins, minlength=nstudents * nbins)
+            peaks = cells.reshape(nstudents, nbins).max(axis=1)
+
+        averages = np.divide(scores, totals, out=np.zeros(nstudents), where=totals > 0)
+        students = [
+            {
+                'student_id': student_id,
+                'total': int(totals[i]),
+                'severity_score': int(scores[i]),
+                'average_severity': round(float(averages[i]), 2),
+                'peak_rate': int(peaks[i]),
+                'by_type': {self.type_names[t]: int(c) for t, c in enumerate(by_type[i]) if c},
+            }
+            for i, student_id in enumerate(self.student_ids)
+        ]
+        students.sort(key=lambda s: s['severity_score'], reverse=True)
+
+        type_totals = by_type.sum(axis=0)
+        return {
+            'students': students,
+            'total': int(totals.sum()),
+            'by_type': {self.type_names[t]: int(c) for t, c in enumerate(type_totals) if c},
+            'average_per_student': round(float(totals.mean()), 2) if nstudents else 0,
+        }
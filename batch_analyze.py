@@ -0,0 +1,179 @@
+"""
+Re-run detection offline over archived webcam recordings.
+
+    python batch_analyze.py recordings/ [--workers 4] [--streams 4] [--frame-step 3]
+
+Every `webcam_*.mp4` in the directory is decoded as fast as possible (every
+`frame_step`-th frame) and run through the same detector stack and episode
+tracking as a live session, using the current thresholds in config.yaml.
+Recordings are spread over `workers` processes; each process loads the models
+once and analyses `streams` recordings at a time, with their face and object
+inference batched through shared inference servers.
+
+For each recording, `<output_dir>/<recording>/` receives a fresh violation
+journal, the evidence captures and a PDF report. Timestamps are media time,
+taken from the recording's name.
+"""
+import argparse
+import copy
+import glob
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+
+import yaml
+
+from detection_system import EyeTracker, FaceDetectionStage, FaceDetector, FaceMeshStage, MouthMonitor, ObjectDetector, MultiFaceDetector
+from inference import InferenceServices
+from pipeline import DetectionPipeline
+from report import ReportGenerator, ViolationCapturer, ViolationEpisodeTracker, ViolationLogger
+from sources import VideoFileSource
+
+
+# Per-process state, built once by init_worker
+worker = {}
+
+
+def load_config():
+    with open('config.yaml') as f:
+        return yaml.safe_load(f)
+
+
+def recording_id(path):
+    """webcam_<session>_<YYYYmmdd_HHMMSS>.mp4 -> <session> (the whole name if it does not match)."""
+    stem = os.path.splitext(os.path.basename(path))[0]
+    match = re.match(r'^webcam_(.+)_\d{8}_\d{6}$', stem)
+    return match.group(1) if match else stem
+
+
+def init_worker(config):
+    worker['config'] = config
+    worker['services'] = InferenceServices(config)
+    worker['services'].start()
+    # Chart images go next to the batch output rather than into the live reports directory
+    report_config = copy.deepcopy(config)
+    report_config.setdefault('reporting', {})['output_dir'] = config.get('batch', {}).get('output_dir', './reports/batch')
+    worker['reports'] = ReportGenerator(report_config)
+
+
+def analyze_recording(path):
+    """Run one recording through the detector stack; returns a summary dict."""
+    config = worker['config']
+    services = worker['services']
+    batch_cfg = config.get('batch', {})
+
+    stem = os.path.splitext(os.path.basename(path))[0]
+    output_dir = os.path.join(batch_cfg.get('output_dir', './reports/batch'), stem)
+    file_config = copy.deepcopy(config)
+    file_config['global']['output_path'] = output_dir
+
+    # Re-scoring replaces the previous results for this recording
+    journal = os.path.join(output_dir, f"violations_{stem}.jsonl")
+    if os.path.exists(journal):
+        os.remove(journal)
+
+    logger = ViolationLogger(file_config, session_id=stem)
+    # Recordings are read faster than realtime: wait for the writer rather than drop evidence
+    capturer = ViolationCapturer(file_config, session_id=stem, block=True)
+
+    def record_episode(episode):
+        timestamp = ViolationEpisodeTracker.timestamp(episode)
+        capture = capturer.capture_violation(episode['frame'], episode['type'], timestamp, when=episode['start'])
+        logger.log_violation(
+            episode['type'], timestamp,
+            ViolationEpisodeTracker.metadata(episode, capture['image_path'] if capture else None)
+        )
+
+    episodes = ViolationEpisodeTracker(file_config, on_end=record_episode)
+    source = VideoFileSource(path, realtime=False, frame_step=batch_cfg.get('frame_step', 1))
+    detectors = [
+        FaceDetector(file_config),
+        EyeTracker(file_config),
+        MouthMonitor(file_config),
+        MultiFaceDetector(file_config),
+        ObjectDetector(file_config, server=services.objects)
+    ]
+    pipeline = DetectionPipeline(
+        file_config, source, FaceDetectionStage(file_config, server=services.faces), FaceMeshStage(file_config),
+        detectors, on_violations=episodes.update, encode_jpeg=False
+    )
+
+    started = time.perf_counter()
+    try:
+        pipeline.start()
+        pipeline.wait()
+    finally:
+        source.release()
+        episodes.close()
+        capturer.close()
+        logger.close()
+    elapsed = time.perf_counter() - started
+
+    violations = logger.get_violations()
+    # Charts are keyed by 'id', so use the full stem: one session can have several recordings
+    student_info = {'id': stem, 'session': recording_id(path), 'recording': os.path.basename(path)}
+    report_path = worker['reports'].generate_report_fpdf(student_info, violations, os.path.join(output_dir, f"report_{stem}.pdf"))
+
+    return {
+        'recording': path,
+        'frames': source.frames_read,
+        'media_seconds': round(source.frame_count / source.fps, 1),
+        'seconds': round(elapsed, 2),
+        'violations': len(violations),
+        'journal': logger.log_file,
+        'report': report_path,
+    }
+
+
+def analyze_group(paths):
+    """Analyse a group of recordings concurrently so their inference requests share batches."""
+    with ThreadPoolExecutor(max_workers=len(paths)) as executor:
+        return list(executor.map(analyze_recording, paths))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('directory')
+    parser.add_argument('--workers', type=int, help="override batch.workers")
+    parser.add_argument('--streams', type=int, help="override batch.streams")
+    parser.add_argument('--frame-step', type=int, help="override batch.frame_step")
+    parser.add_argument('--output-dir', help="override batch.output_dir")
+    args = parser.parse_args()
+
+    config = load_config()
+    batch_cfg = config.setdefault('batch', {})
+    if args.workers:
+        batch_cfg['workers'] = args.workers
+    if args.streams:
+        batch_cfg['streams'] = args.streams
+    if args.frame_step:
+        batch_cfg['frame_step'] = args.frame_step
+    if args.output_dir:
+        batch_cfg['output_dir'] = args.output_dir
+
+    paths = sorted(glob.glob(os.path.join(args.directory, batch_cfg.get('pattern', 'webcam_*.mp4'))))
+    if not paths:
+        print(f"No recordings matching {batch_cfg.get('pattern', 'webcam_*.mp4')} in {args.directory}")
+        return
+
+    streams = max(1, batch_cfg.get('streams', 4))
+    workers = max(1, min(batch_cfg.get('workers', 2), (len(paths) + streams - 1) // streams))
+    groups = [paths[i:i + streams] for i in range(0, len(paths), streams)]
+    print(f"Analysing {len(paths)} recordings with {workers} processes x {streams} streams, frame_step={batch_cfg.get('frame_step', 1)}")
+
+    started = time.perf_counter()
+    frames = 0
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(config,)) as executor:
+        jobs = [executor.submit(analyze_group, group) for group in groups]
+        for job in as_completed(jobs):
+            for summary in job.result():
+                frames += summary['frames']
+                print(f"{summary['recording']}: {summary['violations']} violations, {summary['frames']} frames "
+                      f"({summary['media_seconds']}s) in {summary['seconds']}s -> {summary['report']}")
+    elapsed = time.perf_counter() - started
+    print(f"Done: {len(paths)} recordings, {frames} frames in {elapsed:.1f}s ({frames / elapsed:.1f} frames/s)")
+
+
+if __name__ == '__main__':
+    main()
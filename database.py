@@ -0,0 +1,580 @@
+import json
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import date, datetime
+
+import mysql.connector
+from werkzeug.security import check_password_hash
+
+from analytics import parse_timestamp
+
+
+class MySQLBackend:
+    """Connections to the production MySQL schema (DataBase.sql)."""
+
+    IntegrityError = mysql.connector.IntegrityError
+
+    def __init__(self, db_cfg):
+        self.args = {
+            'host': db_cfg.get('host', 'localhost'),
+            'user': db_cfg.get('user', 'root'),
+            'password': db_cfg.get('password', ''),
+            'database': db_cfg.get('database', 'exam'),
+            'autocommit': True,
+        }
+
+    def connect(self):
+        return mysql.connector.connect(**self.args)
+
+    def prepare(self, raw):
+        # Server-side prepared statement; re-executing the same SQL on it skips the parse
+        return raw.cursor(prepared=True)
+
+    def translate(self, sql):
+        return sql
+
+    def begin(self, raw):
+        raw.start_transaction()
+
+    def ping(self, raw):
+        try:
+            raw.ping(reconnect=False)
+            return True
+        except mysql.connector.Error:
+            return False
+
+
+class SQLiteBackend:
+    """
+    Local stand-in with the same tables as DataBase.sql, for development and
+    load tests without a MySQL server. `%s` placeholders are rewritten to `?`.
+    """
+
+    IntegrityError = sqlite3.IntegrityError
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS users (
+            user_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT NOT NULL UNIQUE,
+            password_hash TEXT NOT NULL,
+            email TEXT NOT NULL UNIQUE,
+            role TEXT NOT NULL CHECK (role IN ('student', 'admin')),
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+        CREATE TABLE IF NOT EXISTS exams (
+            exam_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            exam_name TEXT NOT NULL,
+            course TEXT NOT NULL,
+            date DATE NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS students (
+            student_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL REFERENCES users (user_id) ON DELETE CASCADE,
+            full_name TEXT NOT NULL,
+            course TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS students_user_id ON students (user_id);
+        CREATE TABLE IF NOT EXISTS recordings (
+            recording_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            student_id INTEGER NOT NULL REFERENCES students (student_id) ON DELETE CASCADE,
+            exam_id INTEGER NOT NULL REFERENCES exams (exam_id) ON DELETE CASCADE,
+            video_path TEXT,
+            screen_path TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+        CREATE INDEX IF NOT EXISTS recordings_student_id ON recordings (student_id);
+        CREATE INDEX IF NOT EXISTS recordings_exam_id ON recordings (exam_id);
+        CREATE TABLE IF NOT EXISTS violations (
+            violation_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            student_id INTEGER NOT NULL REFERENCES students (student_id) ON DELETE CASCADE,
+            exam_id INTEGER NOT NULL REFERENCES exams (exam_id) ON DELETE CASCADE,
+            violation_type TEXT,
+            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+            details TEXT
+        );
+        CREATE INDEX IF NOT EXISTS violations_student_id ON violations (student_id);
+        CREATE INDEX IF NOT EXISTS violations_exam_id ON violations (exam_id);
+    """
+
+    def __init__(self, db_cfg):
+        self.path = db_cfg.get('sqlite_path', 'exam.sqlite3')
+        raw = self.connect()
+        try:
+            raw.execute("PRAGMA journal_mode = WAL")
+            raw.executescript(self.SCHEMA)
+        finally:
+            raw.close()
+
+    def connect(self):
+        # isolation_level=None: autocommit, with explicit BEGIN for batched writes
+        raw = sqlite3.connect(self.path, timeout=10, isolation_level=None, check_same_thread=False)
+        raw.execute("PRAGMA foreign_keys = ON")
+        return raw
+
+    def prepare(self, raw):
+        # sqlite3 keeps compiled statements in a per-connection cache
+        return raw.cursor()
+
+    def translate(self, sql):
+        return sql.replace('%s', '?')
+
+    def begin(self, raw):
+        raw.execute("BEGIN")
+
+    def ping(self, raw):
+        try:
+            raw.execute("SELECT 1").fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+
+def make_backend(db_cfg):
+    backend = db_cfg.get('backend', 'mysql')
+    if backend == 'sqlite':
+        return SQLiteBackend(db_cfg)
+    if backend == 'mysql':
+        return MySQLBackend(db_cfg)
+    raise ValueError(f"Unknown database backend: {backend}")
+
+
+class PooledConnection:
+    """One open connection plus the statements prepared on it, keyed by SQL text."""
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.raw = backend.connect()
+        self.statements = {}
+        self.last_used = time.monotonic()
+
+    def execute(self, sql, params=()):
+        """Run a statement on the cursor prepared for it; fetch its rows before running it again."""
+        cursor = self.statements.get(sql)
+        if cursor is None:
+            cursor = self.statements[sql] = self.backend.prepare(self.raw)
+        cursor.execute(self.backend.translate(sql), params)
+        return cursor
+
+    def executemany(self, sql, rows):
+        # A plain cursor, so mysql-connector can rewrite INSERTs into one multi-row statement
+        cursor = self.raw.cursor()
+        try:
+            cursor.executemany(self.backend.translate(sql), rows)
+        finally:
+            cursor.close()
+
+    def fetch_all(self, sql, params=()):
+        cursor = self.execute(sql, params)
+        columns = [column[0] for column in cursor.description or ()]
+        return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+    def fetch_one(self, sql, params=()):
+        rows = self.fetch_all(sql, params)
+        return rows[0] if rows else None
+
+    def begin(self):
+        self.backend.begin(self.raw)
+
+    def commit(self):
+        self.raw.commit()
+
+    def rollback(self):
+        self.raw.rollback()
+
+    def ping(self):
+        return self.backend.ping(self.raw)
+
+    def close(self):
+        for cursor in self.statements.values():
+            try:
+                cursor.close()
+            except Exception:
+                pass
+        self.statements.clear()
+        try:
+            self.raw.close()
+        except Exception:
+            pass
+
+
+class ConnectionPool:
+    """
+    Bounded pool of database connections shared by request handlers and
+    background writers.
+
+    Up to `pool_size` connections are opened on demand and reused most
+    recently used first, each keeping its prepared statements. A connection
+    idle for longer than `health_check_interval` seconds is pinged before it
+    is handed out and replaced if dead; one whose rollback fails after an
+    error is discarded. Callers wait up to `pool_timeout` seconds for a free
+    connection, then get TimeoutError.
+    """
+
+    def __init__(self, config, backend=None):
+        db_cfg = config.get('database', {})
+        self.size = db_cfg.get('pool_size', 8)
+        self.timeout = db_cfg.get('pool_timeout', 5)
+        self.health_check_interval = db_cfg.get('health_check_interval', 30)
+        self.backend = backend or make_backend(db_cfg)
+
+        self.condition = threading.Condition()
+        self.idle = []
+        self.open = 0
+
+        self.checkouts = 0
+        self.waits = 0
+        self.wait_time = 0.0
+        self.timeouts = 0
+        self.health_checks = 0
+        self.reconnects = 0
+
+    def acquire(self):
+        started = time.monotonic()
+        deadline = started + self.timeout
+        with self.condition:
+            self.checkouts += 1
+            waited = False
+            while not self.idle and self.open >= self.size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self.timeouts += 1
+                    raise TimeoutError(f"No database connection free after {self.timeout}s")
+                waited = True
+                self.condition.wait(remaining)
+            if waited:
+                self.waits += 1
+                self.wait_time += time.monotonic() - started
+
+            conn = self.idle.pop() if self.idle else None
+            if conn is None:
+                self.open += 1
+            elif started - conn.last_used > self.health_check_interval:
+                self.health_checks += 1
+            else:
+                return conn
+
+        if conn is not None:
+            if conn.ping():
+                return conn
+            conn.close()
+            with self.condition:
+                self.reconnects += 1
+
+        try:
+            return PooledConnection(self.backend)
+        except Exception:
+            self.discard()
+            raise
+
+    def release(self, conn):
+        conn.last_used = time.monotonic()
+        with self.condition:
+            self.idle.append(conn)
+            self.condition.notify()
+
+    def discard(self, conn=None):
+        if conn is not None:
+            conn.close()
+        with self.condition:
+            self.open -= 1
+            self.condition.notify()
+
+    @contextmanager
+    def connection(self):
+        conn = self.acquire()
+        try:
+            yield conn
+        except Exception:
+            try:
+                conn.rollback()
+            except Exception:
+                self.discard(conn)
+                raise
+            self.release(conn)
+            raise
+        self.release(conn)
+
+    def stats(self):
+        with self.condition:
+            return {
+                'size': self.size,
+                'open': self.open,
+                'idle': len(self.idle),
+                'checkouts': self.checkouts,
+                'waits': self.waits,
+                'avg_wait_ms': round(self.wait_time / self.waits * 1000, 2) if self.waits else 0,
+                'timeouts': self.timeouts,
+                'health_checks': self.health_checks,
+                'reconnects': self.reconnects,
+            }
+
+
+class UserRepository:
+    """
+    Data access for the auth routes. Each call holds a pooled connection only
+    for its query; password hashes are checked after it has been returned, so
+    a burst of logins is limited by hashing, not by the pool.
+    """
+
+    def __init__(self, pool):
+        self.pool = pool
+
+    def find_by_username(self, username):
+        with self.pool.connection() as conn:
+            return conn.fetch_one(
+                "SELECT user_id, username, password_hash, role FROM users WHERE username = %s",
+                (username,)
+            )
+
+    def find_by_id(self, user_id):
+        with self.pool.connection() as conn:
+            return conn.fetch_one(
+                "SELECT user_id, username, role FROM users WHERE user_id = %s",
+                (user_id,)
+            )
+
+    def authenticate(self, username, password):
+        """The user row if the password matches, otherwise None."""
+        user = self.find_by_username(username)
+        if user and check_password_hash(user['password_hash'], password):
+            return user
+        return None
+
+    def exists(self, username, email):
+        with self.pool.connection() as conn:
+            return conn.fetch_one(
+                "SELECT user_id FROM users WHERE username = %s OR email = %s",
+                (username, email)
+            ) is not None
+
+    def create(self, username, password_hash, email, role):
+        """Insert a user and return its ID, or None if the username or email is taken."""
+        try:
+            with self.pool.connection() as conn:
+                return conn.execute(
+                    "INSERT INTO users (username, password_hash, email, role) VALUES (%s, %s, %s, %s)",
+                    (username, password_hash, email, role)
+                ).lastrowid
+        except self.pool.backend.IntegrityError:
+            return None
+
+
+class ProctoringStore:
+    """
+    Persists violations and recording metadata to the `violations` and
+    `recordings` tables and reads them back for reports.
+
+    Writes only append to an in-memory buffer; a background thread inserts it
+    every `flush_interval` seconds, or sooner once `batch_size` rows are
+    waiting, with one executemany per table (sent by mysql-connector as a
+    single multi-row INSERT). A failed batch is kept and retried on the next
+    flush, up to `max_pending` rows; the local journal stays the fallback.
+
+    Callers pass `users.user_id`; the matching `students` row, and the exam
+    row, are created on first use.
+    """
+
+    VIOLATION_INSERT = (
+        "INSERT INTO violations (student_id, exam_id, violation_type, timestamp, details) "
+        "VALUES (%s, %s, %s, %s, %s)"
+    )
+    RECORDING_INSERT = (
+        "INSERT INTO recordings (student_id, exam_id, video_path, screen_path) "
+        "VALUES (%s, %s, %s, %s)"
+    )
+
+    def __init__(self, config, pool):
+        db_cfg = config.get('database', {})
+        writer_cfg = db_cfg.get('writer', {})
+        self.flush_interval = writer_cfg.get('flush_interval', 1.0)
+        self.batch_size = writer_cfg.get('batch_size', 200)
+        self.max_pending = writer_cfg.get('max_pending', 10000)
+        self.exam_name = db_cfg.get('exam_name', 'Final Examination')
+        self.course = db_cfg.get('course', 'Computer Science 101')
+
+        self.pool = pool
+        self.lock = threading.Lock()
+        self.flush_lock = threading.Lock()
+        self.pending = []
+        self.student_ids = {}
+        self.exam_ids = set()
+
+        self.stop_event = threading.Event()
+        self.flush_event = threading.Event()
+        self.thread = None
+        self.written = 0
+        self.failed_batches = 0
+        self.dropped = 0
+
+    def start(self):
+        if self.thread is None:
+            self.stop_event.clear()
+            self.thread = threading.Thread(target=self.run, name='db-writer', daemon=True)
+            self.thread.start()
+
+    def close(self):
+        """Stop the writer after a final flush."""
+        self.stop_event.set()
+        self.flush_event.set()
+        if self.thread:
+            self.thread.join(timeout=10)
+            self.thread = None
+
+    def run(self):
+        while not self.stop_event.is_set():
+            self.flush_event.wait(self.flush_interval)
+            self.flush_event.clear()
+            self.flush()
+        self.flush()
+
+    def enqueue(self, table, user_id, exam_id, values):
+        with self.lock:
+            self.pending.append((table, int(user_id), int(exam_id), values))
+            if len(self.pending) > self.max_pending:
+                self.dropped += len(self.pending) - self.max_pending
+                del self.pending[:len(self.pending) - self.max_pending]
+            waiting = len(self.pending)
+        if waiting >= self.batch_size:
+            self.flush_event.set()
+
+    def add_violation(self, user_id, exam_id, entry):
+        """Queue one ViolationLogger entry for insertion."""
+        try:
+            when = parse_timestamp(entry['timestamp'])
+        except (TypeError, ValueError):
+            when = datetime.now()
+        details = json.dumps({'timestamp': entry['timestamp'], 'metadata': entry.get('metadata', {})})
+        self.enqueue('violations', user_id, exam_id, (entry['type'], when.strftime("%Y-%m-%d %H:%M:%S"), details))
+
+    def add_recording(self, user_id, exam_id, video_path=None, screen_path=None):
+        self.enqueue('recordings', user_id, exam_id, (video_path, screen_path))
+
+    def flush(self):
+        """Insert everything buffered so far; returns the number of rows written."""
+        with self.flush_lock:
+            with self.lock:
+                pending, self.pending = self.pending, []
+            if not pending:
+                return 0
+
+            try:
+                with self.pool.connection() as conn:
+                    conn.begin()
+                    students, exams = {}, set()
+                    rows = {'violations': [], 'recordings': []}
+                    for table, user_id, exam_id, values in pending:
+                        student_id = self.resolve_student(conn, user_id, students)
+                        self.resolve_exam(conn, exam_id, exams)
+                        rows[table].append((student_id, exam_id) + values)
+
+                    if rows['violations']:
+                        conn.executemany(self.VIOLATION_INSERT, rows['violations'])
+                    if rows['recordings']:
+                        conn.executemany(self.RECORDING_INSERT, rows['recordings'])
+                    conn.commit()
+            except Exception as e:
+                print(f"[ProctoringStore] Failed to write {len(pending)} rows: {e}")
+                with self.lock:
+                    self.failed_batches += 1
+                    self.pending = pending + self.pending
+                    if len(self.pending) > self.max_pending:
+                        self.dropped += len(self.pending) - self.max_pending
+                        del self.pending[:len(self.pending) - self.max_pending]
+                return 0
+
+            # Only trust IDs created inside a committed transaction
+            with self.lock:
+                self.student_ids.update(students)
+                self.exam_ids.update(exams)
+                self.written += len(pending)
+            return len(pending)
+
+    def resolve_student(self, conn, user_id, created):
+        if user_id in self.student_ids:
+            return self.student_ids[user_id]
+        if user_id in created:
+            return created[user_id]
+
+        row = conn.fetch_one("SELECT student_id FROM students WHERE user_id = %s", (user_id,))
+        if row:
+            student_id = row['student_id']
+        else:
+            user = conn.fetch_one("SELECT username FROM users WHERE user_id = %s", (user_id,))
+            student_id = conn.execute(
+                "INSERT INTO students (user_id, full_name, course) VALUES (%s, %s, %s)",
+                (user_id, user['username'] if user else f"User {user_id}", self.course)
+            ).lastrowid
+        created[user_id] = student_id
+        return student_id
+
+    def resolve_exam(self, conn, exam_id, created):
+        if exam_id in self.exam_ids or exam_id in created:
+            return
+        if conn.fetch_one("SELECT exam_id FROM exams WHERE exam_id = %s", (exam_id,)) is None:
+            conn.execute(
+                "INSERT INTO exams (exam_id, exam_name, course, date) VALUES (%s, %s, %s, %s)",
+                (exam_id, self.exam_name, self.course, date.today().isoformat())
+            )
+        created.add(exam_id)
+
+    @staticmethod
+    def violation_entry(violation_type, when, details):
+        """Rebuild the ViolationLogger entry shape from a `violations` row."""
+        try:
+            data = json.loads(details) if details else {}
+        except ValueError:
+            data = {}
+        return {
+            'type': violation_type,
+            'timestamp': data.get('timestamp') or str(when),
+            'metadata': data.get('metadata', {})
+        }
+
+    def query(self, sql, params):
+        with self.pool.connection() as conn:
+            return conn.fetch_all(sql, params)
+
+    def get_violations(self, user_id, exam_id):
+        """One student's violations for an exam, oldest first."""
+        try:
+            params = (int(user_id), int(exam_id))
+        except (TypeError, ValueError):
+            print(f"[ProctoringStore] Invalid student or exam ID: {user_id!r}, {exam_id!r}")
+            return []
+        if self.pending:
+            self.flush()
+        rows = self.query(
+            "SELECT v.violation_type, v.timestamp, v.details FROM violations v "
+            "JOIN students s ON s.student_id = v.student_id "
+            "WHERE s.user_id = %s AND v.exam_id = %s ORDER BY v.violation_id",
+            params
+        )
+        return [self.violation_entry(row['violation_type'], row['timestamp'], row['details']) for row in rows]
+
+    def exam_violations(self, exam_id):
+        """{user_id: violations} for every student with violations in this exam."""
+        if self.pending:
+            self.flush()
+        rows = self.query(
+            "SELECT s.user_id, v.violation_type, v.timestamp, v.details FROM violations v "
+            "JOIN students s ON s.student_id = v.student_id "
+            "WHERE v.exam_id = %s ORDER BY v.violation_id",
+            (int(exam_id),)
+        )
+        logs = {}
+        for row in rows:
+            logs.setdefault(str(row['user_id']), []).append(
+                self.violation_entry(row['violation_type'], row['timestamp'], row['details'])
+            )
+        return logs
+
+    def stats(self):
+        with self.lock:
+            return {
+                'pending': len(self.pending),
+                'written': self.written,
+                'failed_batches': self.failed_batches,
+                'dropped': self.dropped,
+            }
@@ -1,70 +1,141 @@
-import pyaudio
 import numpy as np
+import queue
 import threading
+import wave
 from collections import deque
-import whisper
 
 import cv2
-import mediapipe as mp
 from datetime import datetime
 
-import torch
-from facenet_pytorch import MTCNN
-from ultralytics import YOLO
+from sources import open_audio_source
+
+
+# torch, facenet_pytorch, ultralytics, mediapipe and whisper take seconds to
+# import, so they are imported where a model is built rather than here: the web
+# app starts without them and detectors that are never used never load them.
+MODEL_LIBRARIES = ('torch', 'facenet_pytorch', 'ultralytics', 'mediapipe')
+
+
+def load_face_model():
+    """Build the MTCNN face detector used by FaceDetectionStage and the face inference server."""
+    import torch
+    from facenet_pytorch import MTCNN
+
+    device = torch.device('cuda:0' if torch.cuda.is_available() else 'cpu')
+    return MTCNN(
+        keep_all=True,
+        post_process=False,
+        min_face_size=40,
+        thresholds=[0.6, 0.7, 0.7],
+        device=device
+    )
+
+
+def load_object_model(min_confidence):
+    """Build and warm up the YOLOv8n model used by ObjectDetector and the object inference server."""
+    import torch
+    from ultralytics import YOLO
+
+    model = YOLO('models/yolov8n.pt')
+    model.overrides['conf'] = min_confidence
+    model.overrides['device'] = 'cuda' if torch.cuda.is_available() else 'cpu'
+    model.overrides['imgsz'] = 320
+    model.overrides['iou'] = 0.45
+
+    # Warm-up with a dummy image (as tensor might not suffice)
+    dummy_img = np.zeros((320, 320, 3), dtype=np.uint8)
+    model(dummy_img)
+    return model
+
+
+class FrameContext:
+    """
+    Wraps one captured BGR frame and builds derived views (RGB, grayscale,
+    downscaled copies) only the first time a detector asks for them.
+    Shared stage results (faces, landmarks) are attached here as well so every
+    detector reads the same per-frame data.
+    """
+
+    def __init__(self, frame, frame_id=None, timestamp=None):
+        self.frame = frame
+        self.frame_id = frame_id
+        self.timestamp = timestamp or datetime.now()
+        self.height, self.width = frame.shape[:2]
+
+        self.faces = None
+        self.landmarks = None
+
+        self._rgb = None
+        self._gray = None
+        self._resized = {}
+
+    @property
+    def rgb(self):
+        if self._rgb is None:
+            self._rgb = cv2.cvtColor(self.frame, cv2.COLOR_BGR2RGB)
+        return self._rgb
+
+    @property
+    def gray(self):
+        if self._gray is None:
+            self._gray = cv2.cvtColor(self.frame, cv2.COLOR_BGR2GRAY)
+        return self._gray
+
+    def resized(self, width):
+        """BGR copy scaled to the given width, keeping the aspect ratio."""
+        if width not in self._resized:
+            height = int(self.height * (width / self.width))
+            self._resized[width] = cv2.resize(self.frame, (width, height))
+        return self._resized[width]
 
 
 class ObjectDetector:
-    def __init__(self, config):
+    INPUT_WIDTH = 320
+
+    def __init__(self, config, server=None):
         self.config = config['detection']['objects']
         self.class_map = {
             73: 'book',
             67: 'cell phone'
         }
 
-        self.detection_interval = self.config['detection_interval']
         self.min_confidence = self.config['min_confidence']
-        self.max_fps = self.config['max_fps']
 
         self.alert_logger = None
-        self.frame_count = 0
-        self.last_detection_time = datetime.now()
+        self.last_confidence = 0.0
 
-        self._initialize_model()
+        # With a shared ObjectInferenceServer the model lives there and is batched across sessions;
+        # otherwise it is built on the first detection
+        self.server = server
+        self.model = None
 
     def _initialize_model(self):
         try:
-            self.model = YOLO('models/yolov8n.pt')
-            self.model.overrides['conf'] = self.min_confidence
-            self.model.overrides['device'] = 'cuda' if torch.cuda.is_available() else 'cpu'
-            self.model.overrides['imgsz'] = 320
-            self.model.overrides['iou'] = 0.45
-
-            # Warm-up with a dummy image (as tensor might not suffice)
-            dummy_img = np.zeros((320, 320, 3), dtype=np.uint8)
-            self.model(dummy_img)
-
+            self.model = load_object_model(self.min_confidence)
         except Exception as e:
             raise RuntimeError(f"Failed to initialize object detector: {str(e)}")
 
     def set_alert_logger(self, alert_logger):
         self.alert_logger = alert_logger
 
-    def detect_objects(self, frame, visualize=False):
-        current_time = datetime.now()
-        if (current_time - self.last_detection_time).total_seconds() < (1.0 / self.max_fps):
-            return False
-
+    def detect_objects(self, ctx, visualize=False):
+        """Runs YOLO on the frame; how often is decided by the DetectorScheduler."""
         try:
-            orig_h, orig_w = frame.shape[:2]
-            target_w = 320
-            target_h = int(orig_h * (target_w / orig_w))
-            resized_frame = cv2.resize(frame, (target_w, target_h))
+            frame = ctx.frame
+            resized_frame = ctx.resized(self.INPUT_WIDTH)
+            target_h, target_w = resized_frame.shape[:2]
 
-            scale_x = orig_w / target_w
-            scale_y = orig_h / target_h
+            scale_x = ctx.width / target_w
+            scale_y = ctx.height / target_h
 
-            results = self.model(resized_frame, verbose=False)
+            if self.server is not None:
+                results = [self.server.infer(resized_frame)]
+            else:
+                if self.model is None:
+                    self._initialize_model()
+                results = self.model(resized_frame, verbose=False)
             detected = False
+            self.last_confidence = 0.0
 
             for result in results:
                 for box in result.boxes:
@@ -74,6 +145,7 @@ class ObjectDetector:
                     if cls_id in self.class_map and conf >= self.min_confidence:
                         label = self.class_map[cls_id]
                         detected = True
+                        self.last_confidence = max(self.last_confidence, conf)
 
                         if self.alert_logger:
                             self.alert_logger.log_alert(
@@ -96,7 +168,6 @@ class ObjectDetector:
                                 (0, 0, 255), 1
                             )
 
-            self.last_detection_time = current_time
             return detected
 
         except Exception as e:
@@ -109,52 +180,155 @@ class ObjectDetector:
 
 
 
-class MultiFaceDetector:
-    def __init__(self, config):
-        multi_face_cfg = config['detection']['multi_face']
-        self.alert_threshold = multi_face_cfg['alert_threshold']
-        self.consecutive_frames = 0
+class FaceDetections:
+    """Result of a single MTCNN pass over a frame, shared by the face-based detectors."""
+
+    def __init__(self, boxes=None, probs=None):
+        if boxes is None or probs is None:
+            boxes, probs = [], []
+        pairs = [(b, p) for b, p in zip(boxes, probs) if p is not None]
+        self.boxes = [b for b, _ in pairs]
+        self.probs = [float(p) for _, p in pairs]
+
+    @property
+    def present(self):
+        return len(self.boxes) > 0
+
+    @property
+    def confidence(self):
+        """Highest face probability in the frame (0.0 when no face was found)."""
+        return max(self.probs) if self.probs else 0.0
+
+    def count(self, min_confidence=0.0):
+        return sum(p > min_confidence for p in self.probs)
+
+    def confidence_at(self, rank):
+        """Probability of the rank-th most confident face (0.0 if there are fewer faces)."""
+        ranked = sorted(self.probs, reverse=True)
+        return ranked[rank] if rank < len(ranked) else 0.0
+
+
+class FaceDetectionStage:
+    """
+    Owns the single MTCNN model for a session (or forwards to a shared
+    FaceInferenceServer) and runs it once per frame. FaceDetector and
+    MultiFaceDetector both consume the returned FaceDetections.
+    """
+
+    def __init__(self, config, server=None):
         self.alert_logger = None
 
-        self.device = torch.device('cuda:0' if torch.cuda.is_available() else 'cpu')
-        self.detector = MTCNN(
-            keep_all=True,
-            post_process=False,
-            min_face_size=40,
-            thresholds=[0.6, 0.7, 0.7],
-            device=self.device
-        )
+        # Built on the first frame (on the detection thread) unless a shared server is used
+        self.server = server
+        self.detector = None
 
     def set_alert_logger(self, logger):
         self.alert_logger = logger
 
-    def detect_multiple_faces(self, frame):
-        """Detects if multiple faces are present over consecutive frames."""
-        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        boxes, probs = self.detector.detect(rgb_frame)
+    def detect(self, ctx):
+        """Runs MTCNN on the frame (once) and stores the result on ctx.faces."""
+        if ctx.faces is not None:
+            return ctx.faces
 
-        if boxes is not None and probs is not None:
-            high_conf_faces = sum(p > 0.9 for p in probs if p is not None)
+        try:
+            if self.server is not None:
+                boxes, probs = self.server.infer(ctx.rgb)
+            else:
+                if self.detector is None:
+                    self.detector = load_face_model()
+                boxes, probs = self.detector.detect(ctx.rgb)
+            ctx.faces = FaceDetections(boxes, probs)
+        except Exception as e:
+            if self.alert_logger:
+                self.alert_logger.log_alert("FACE_DETECTION_ERROR", f"Face detection failed: {str(e)}")
+            ctx.faces = FaceDetections()
+        return ctx.faces
 
-            if high_conf_faces >= 2:
-                self.consecutive_frames += 1
 
-                if self.consecutive_frames >= self.alert_threshold:
-                    if self.alert_logger:
-                        self.alert_logger.log_alert(
-                            "MULTIPLE_FACES",
-                            f"Detected {high_conf_faces} faces for {self.consecutive_frames} frames"
-                        )
-                    return True
-            else:
-                self.consecutive_frames = 0
+class MultiFaceDetector:
+    """
+    Flags several faces once they have been seen continuously for
+    `alert_seconds`, measured on frame timestamps so the threshold does not
+    depend on how often the scheduler runs the check.
+    """
+
+    HIGH_CONFIDENCE = 0.9
+
+    def __init__(self, config):
+        multi_face_cfg = config['detection']['multi_face']
+        self.alert_seconds = multi_face_cfg.get('alert_seconds', 1.0)
+        self.multiple_since = None
+        self.alert_logger = None
+
+    def set_alert_logger(self, logger):
+        self.alert_logger = logger
+
+    def detect_multiple_faces(self, ctx):
+        """Detects if multiple faces have been present for at least `alert_seconds`."""
+        high_conf_faces = ctx.faces.count(self.HIGH_CONFIDENCE) if ctx.faces else 0
+
+        if high_conf_faces >= 2:
+            if self.multiple_since is None:
+                self.multiple_since = ctx.timestamp
+            duration = (ctx.timestamp - self.multiple_since).total_seconds()
+
+            if duration >= self.alert_seconds:
+                if self.alert_logger:
+                    self.alert_logger.log_alert(
+                        "MULTIPLE_FACES",
+                        f"Detected {high_conf_faces} faces for {duration:.1f} seconds"
+                    )
+                return True
         else:
-            self.consecutive_frames = 0
+            self.multiple_since = None
 
         return False
 
 
 
+class FaceMeshStage:
+    """
+    Runs MediaPipe face mesh once per frame and shares the resulting landmarks
+    with every landmark-based detector (EyeTracker, MouthMonitor). The mesh
+    is built on the first frame, on the detection thread.
+    """
+
+    def __init__(self, config):
+        self.alert_logger = None
+        self.face_mesh = None
+
+    def set_alert_logger(self, logger):
+        self.alert_logger = logger
+
+    def load(self):
+        import mediapipe as mp
+
+        self.face_mesh = mp.solutions.face_mesh.FaceMesh(
+            max_num_faces=1,
+            refine_landmarks=True,
+            min_detection_confidence=0.5,
+            min_tracking_confidence=0.5
+        )
+
+    def process(self, ctx):
+        """
+        Stores the landmark list of the first face on ctx.landmarks and returns it
+        (None if no face was found).
+        """
+        try:
+            if self.face_mesh is None:
+                self.load()
+            results = self.face_mesh.process(ctx.rgb)
+        except Exception as e:
+            if self.alert_logger:
+                self.alert_logger.log_alert("FACE_MESH_ERROR", f"Face mesh failed: {str(e)}")
+            return None
+
+        if results.multi_face_landmarks:
+            ctx.landmarks = results.multi_face_landmarks[0].landmark
+        return ctx.landmarks
+
+
 class MouthMonitor:
     MOUTH_OPEN_THRESHOLD = 0.03
     MOUTH_WIDTH_THRESHOLD = 0.2
@@ -166,14 +340,6 @@ class MouthMonitor:
 
         self.alert_logger = None
 
-        self.mp_face_mesh = mp.solutions.face_mesh
-        self.face_mesh = self.mp_face_mesh.FaceMesh(
-            max_num_faces=1,
-            refine_landmarks=True,
-            min_detection_confidence=0.5,
-            min_tracking_confidence=0.5
-        )
-
         # Landmark indices for mouth detection
         self.MOUTH_POINTS = {
             "upper_inner": 13,
@@ -185,14 +351,12 @@ class MouthMonitor:
     def set_alert_logger(self, logger):
         self.alert_logger = logger
 
-    def monitor_mouth(self, frame):
-        rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        results = self.face_mesh.process(rgb)
-
-        if not results.multi_face_landmarks:
+    def monitor_mouth(self, ctx):
+        """Checks mouth openness/width on landmarks from the shared FaceMeshStage."""
+        landmarks = ctx.landmarks
+        if landmarks is None:
             return False
 
-        landmarks = results.multi_face_landmarks[0].landmark
         mouth_open = self.mouth_openness(landmarks)
         mouth_width = self.mouth_width(landmarks)
 
@@ -221,27 +385,11 @@ class MouthMonitor:
         return abs(left - right)
 
 
-import cv2
-import torch
-from datetime import datetime
-from facenet_pytorch import MTCNN
-
-
 class FaceDetector:
     def __init__(self, config):
         face_cfg = config['detection']['face']
-        self.device = torch.device('cuda:0' if torch.cuda.is_available() else 'cpu')
-        self.detector = MTCNN(
-            keep_all=True,
-            post_process=False,
-            min_face_size=40,
-            thresholds=[0.6, 0.7, 0.7],
-            device=self.device
-        )
-        self.detection_interval = face_cfg['detection_interval']
         self.min_confidence = face_cfg['min_confidence']
 
-        self.frame_count = 0
         self.face_present = False
         self.last_face_time = None
         self.face_disappeared_start = None
@@ -250,25 +398,19 @@ class FaceDetector:
     def set_alert_logger(self, logger):
         self.alert_logger = logger
 
-    def detect_face(self, frame):
-        self.frame_count += 1
-        if self.frame_count % self.detection_interval != 0:
-            return self.face_present
-
-        rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        boxes, probs = self.detector.detect(rgb)
-
+    def detect_face(self, ctx):
+        """Updates face presence from the shared FaceDetectionStage result."""
         current_time = datetime.now()
 
-        if self.face_detected(boxes, probs):
+        if self.face_detected(ctx.faces):
             self.handle_face_present(current_time)
             return True
         else:
             self.handle_face_absent(current_time)
             return False
 
-    def face_detected(self, boxes, probs):
-        return boxes is not None and len(boxes) > 0 and probs[0] > self.min_confidence
+    def face_detected(self, faces):
+        return faces is not None and faces.present and faces.confidence > self.min_confidence
 
     def handle_face_present(self, now):
         if not self.face_present and self.face_disappeared_start:
@@ -307,14 +449,6 @@ class EyeTracker:
         self.config = config['detection']['eyes']
         self.eye_threshold = self.config['gaze_threshold']
 
-        self.mp_face_mesh = mp.solutions.face_mesh
-        self.face_mesh = self.mp_face_mesh.FaceMesh(
-            max_num_faces=1,
-            refine_landmarks=True,
-            min_detection_confidence=0.5,
-            min_tracking_confidence=0.5
-        )
-
         self.gaze_direction = "center"
         self.eye_ratio = 0.3  # Default open eye ratio
         self.last_gaze_change = datetime.now()
@@ -359,22 +493,20 @@ class EyeTracker:
                 self.alert_logger.log_alert("EYE_MOVEMENT", "Excessive eye movement detected")
             self.gaze_changes = 0
 
-    def track_eyes(self, frame):
+    def track_eyes(self, ctx):
+        """Updates gaze and eye ratio from landmarks produced by the shared FaceMeshStage."""
         try:
-            rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            results = self.face_mesh.process(rgb)
-
-            if not results.multi_face_landmarks:
+            landmarks = ctx.landmarks
+            if landmarks is None:
                 return self.gaze_direction, self.eye_ratio
 
-            face = results.multi_face_landmarks[0]
-            frame_h, frame_w = frame.shape[:2]
+            frame_h, frame_w = ctx.height, ctx.width
 
-            left_eye = self.get_eye_coords(face.landmark, self.LEFT_EYE_INDICES, frame_w, frame_h)
-            right_eye = self.get_eye_coords(face.landmark, self.RIGHT_EYE_INDICES, frame_w, frame_h)
+            left_eye = self.get_eye_coords(landmarks, self.LEFT_EYE_INDICES, frame_w, frame_h)
+            right_eye = self.get_eye_coords(landmarks, self.RIGHT_EYE_INDICES, frame_w, frame_h)
             nose_tip = np.array([
-                face.landmark[self.NOSE_TIP_INDEX].x * frame_w,
-                face.landmark[self.NOSE_TIP_INDEX].y * frame_h
+                landmarks[self.NOSE_TIP_INDEX].x * frame_w,
+                landmarks[self.NOSE_TIP_INDEX].y * frame_h
             ])
 
             # Eye aspect ratio
@@ -393,99 +525,391 @@ class EyeTracker:
                 self.alert_logger.log_alert("EYE_TRACKING_ERROR", f"Eye tracking error: {str(e)}")
             return self.gaze_direction, self.eye_ratio
 
+class TranscriptionWorker:
+    """
+    Runs Whisper on finished voice segments on its own thread, so the audio
+    capture thread never waits on transcription.
+
+    Segments arrive with their absolute sample offsets through a bounded
+    queue; when it is full the oldest waiting segment is dropped, keeping the
+    most recent speech. Audio that overlaps what has already been transcribed
+    is trimmed off, so every stretch of audio is transcribed at most once.
+    Results are passed to `on_transcript(text, start_sample, end_sample)`.
+    If Whisper cannot be imported or loaded the error goes to `on_error` and
+    the worker marks itself disabled; later segments are discarded.
+    """
+
+    STOP_TIMEOUT = 5.0
+
+    def __init__(self, model_name, on_transcript, queue_size=4, sample_rate=16000, min_duration=0.3):
+        self.model_name = model_name
+        self.on_transcript = on_transcript
+        self.sample_rate = sample_rate
+        self.min_samples = int(min_duration * sample_rate)
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.model = None
+        self.thread = None
+        self.transcribed_until = 0
+        self.transcribed = 0
+        self.dropped = {'queue_full': 0, 'duplicate': 0}
+        self.on_error = None
+        self.disabled = False
+
+    def start(self):
+        if self.thread is None:
+            self.thread = threading.Thread(target=self.run, name='whisper', daemon=True)
+            self.thread.start()
+
+    def stop(self):
+        if self.thread:
+            if self.thread.is_alive():
+                # Never block on a full queue: drop queued segments to make room for the sentinel
+                while True:
+                    try:
+                        self.queue.put_nowait(None)
+                        break
+                    except queue.Full:
+                        try:
+                            self.queue.get_nowait()
+                        except queue.Empty:
+                            pass
+            self.thread.join(timeout=self.STOP_TIMEOUT)
+            self.thread = None
+
+    def submit(self, start_sample, samples):
+        """Queue an int16 segment starting at `start_sample`; never blocks."""
+        if self.disabled:
+            return
+        while True:
+            try:
+                self.queue.put_nowait((start_sample, samples))
+                return
+            except queue.Full:
+                try:
+                    self.queue.get_nowait()
+                    self.dropped['queue_full'] += 1
+                except queue.Empty:
+                    pass
+
+    def run(self):
+        # Imported and loaded here so starting the monitor does not wait on the model
+        try:
+            import whisper
+
+            self.model = whisper.load_model(self.model_name)
+        except Exception as e:
+            self.disabled = True
+            print(f"[TranscriptionWorker] Transcription disabled, could not load Whisper '{self.model_name}': {e}")
+            if self.on_error:
+                self.on_error(e)
+            return
+        while True:
+            item = self.queue.get()
+            if item is None:
+                break
+            start_sample, samples = item
+
+            end_sample = start_sample + len(samples)
+            if start_sample < self.transcribed_until:
+                samples = samples[self.transcribed_until - start_sample:]
+                start_sample = self.transcribed_until
+            if len(samples) < self.min_samples:
+                self.dropped['duplicate'] += 1
+                continue
+
+            try:
+                audio = samples.astype(np.float32) / 32768.0
+                result = self.model.transcribe(audio, fp16=False, language='en')
+                self.transcribed_until = end_sample
+                self.transcribed += 1
+                self.on_transcript(result.get('text', '').strip(), start_sample, end_sample)
+            except Exception as e:
+                if self.on_error:
+                    self.on_error(e)
+
+    def stats(self):
+        return {
+            'transcribed': self.transcribed, 'queued': self.queue.qsize(),
+            'dropped': dict(self.dropped), 'disabled': self.disabled
+        }
+
+
+class VoiceActivityDetector:
+    """
+    Streaming voice activity detection over fixed-size int16 chunks.
+
+    Energy and zero-crossing rate are computed with array operations over a
+    (chunks, samples) block: one chunk at a time when streaming, a whole file
+    at once offline. A chunk is a speech candidate when its energy exceeds
+    both `energy_threshold` and `noise_ratio` times an adaptive noise floor
+    (an EMA of energy over non-speech chunks) and its ZCR is at most
+    `zcr_threshold`. Candidates are smoothed by a majority vote over the last
+    `smoothing` chunks. An utterance starts after `min_speech` seconds of
+    smoothed speech (timed from its onset) and ends once `hangover` seconds
+    pass without any.
+
+    process() returns a list of events:
+    {'event': 'start' | 'end', 'start_sample', 'start', and for 'end' also
+    'end_sample', 'end', 'duration'}, with times in seconds of stream audio.
+    """
+
+    def __init__(self, cfg, energy_threshold, zcr_threshold, sample_rate=16000, chunk_size=512):
+        self.energy_threshold = energy_threshold
+        self.zcr_threshold = zcr_threshold
+        self.sample_rate = sample_rate
+        self.chunk_size = chunk_size
+        self.smoothing = max(1, cfg.get('smoothing', 5))
+        self.min_speech_samples = int(cfg.get('min_speech', 0.2) * sample_rate)
+        self.hangover_samples = int(cfg.get('hangover', 0.4) * sample_rate)
+        self.noise_ratio = cfg.get('noise_ratio', 3.0)
+        self.noise_adapt = cfg.get('noise_adapt', 0.05)
+        self.reset()
+
+    def reset(self):
+        self.position = 0
+        self.noise_floor = None
+        self.history = np.zeros(self.smoothing, dtype=bool)
+        self.history_index = 0
+        self.previous_candidate = False
+        self.onset = None
+        self.in_speech = False
+        self.speech_start = None
+        self.silence_start = None
+
+    @staticmethod
+    def features(frames):
+        """(chunks, samples) int16 -> per-chunk mean energy and zero-crossing rate."""
+        x = frames.astype(np.float32) / 32768.0
+        energy = np.einsum('ij,ij->i', x, x) / x.shape[1]
+        negative = np.signbit(x)
+        # x2 keeps the scale of the old mean(|diff(sign(x))|), which counted each crossing twice
+        zcr = 2.0 * np.count_nonzero(negative[:, 1:] != negative[:, :-1], axis=1) / (x.shape[1] - 1)
+        return energy, zcr
+
+    def process(self, chunk):
+        energy, zcr = self.features(chunk[np.newaxis, :])
+        return self.step(float(energy[0]), float(zcr[0]), len(chunk))
+
+    def process_samples(self, samples):
+        """Run a whole recording through the detector; returns all events, closing a trailing utterance."""
+        count = len(samples) // self.chunk_size
+        frames = np.asarray(samples[:count * self.chunk_size], dtype=np.int16).reshape(count, self.chunk_size)
+        events = []
+        for energy, zcr in zip(*(values.tolist() for values in self.features(frames))):
+            events.extend(self.step(energy, zcr, self.chunk_size))
+        events.extend(self.finish())
+        return events
+
+    def step(self, energy, zcr, length):
+        start = self.position
+        self.position += length
+
+        threshold = self.energy_threshold
+        if self.noise_floor is not None:
+            threshold = max(threshold, self.noise_floor * self.noise_ratio)
+        candidate = energy >= threshold and zcr <= self.zcr_threshold
+
+        if not candidate and not self.in_speech:
+            if self.noise_floor is None:
+                self.noise_floor = energy
+            else:
+                self.noise_floor += self.noise_adapt * (energy - self.noise_floor)
+        if candidate and not self.previous_candidate:
+            self.onset = start
+        self.previous_candidate = candidate
+
+        self.history[self.history_index] = candidate
+        self.history_index = (self.history_index + 1) % self.smoothing
+        voiced = np.count_nonzero(self.history) * 2 > self.smoothing
+
+        events = []
+        if not self.in_speech:
+            if not voiced:
+                self.speech_start = None
+            else:
+                if self.speech_start is None:
+                    self.speech_start = self.onset if self.onset is not None else start
+                if self.position - self.speech_start >= self.min_speech_samples:
+                    self.in_speech = True
+                    self.silence_start = None
+                    events.append(self.event('start', self.speech_start))
+        elif voiced:
+            self.silence_start = None
+        else:
+            if self.silence_start is None:
+                self.silence_start = start
+            if self.position - self.silence_start >= self.hangover_samples:
+                events.append(self.event('end', self.speech_start, self.silence_start))
+                self.in_speech = False
+                self.speech_start = None
+                self.silence_start = None
+        return events
+
+    def finish(self):
+        """Close an utterance still open at the end of the stream."""
+        if not self.in_speech:
+            return []
+        end = self.silence_start if self.silence_start is not None else self.position
+        event = self.event('end', self.speech_start, end)
+        self.in_speech = False
+        self.speech_start = None
+        self.silence_start = None
+        return [event]
+
+    def event(self, kind, start_sample, end_sample=None):
+        event = {'event': kind, 'start_sample': start_sample, 'start': start_sample / self.sample_rate}
+        if end_sample is not None:
+            event['end_sample'] = end_sample
+            event['end'] = end_sample / self.sample_rate
+            event['duration'] = (end_sample - start_sample) / self.sample_rate
+        return event
+
+    def detect_file(self, path):
+        """Offline check: run a mono 16-bit WAV file through a fresh detector state."""
+        with wave.open(path, 'rb') as wav:
+            if wav.getnchannels() != 1 or wav.getsampwidth() != 2:
+                raise ValueError(f"{path}: expected mono 16-bit PCM")
+            if wav.getframerate() != self.sample_rate:
+                raise ValueError(f"{path}: expected {self.sample_rate} Hz, got {wav.getframerate()}")
+            samples = np.frombuffer(wav.readframes(wav.getnframes()), dtype=np.int16)
+        self.reset()
+        return self.process_samples(samples)
+
+
 class AudioMonitor:
     def __init__(self, config):
         self.load_config(config['detection']['audio_monitoring'])
         self.init_state()
         if self.whisper_enabled:
-            self.load_whisper_model()
+            self.transcriber = TranscriptionWorker(
+                self.whisper_model_name, self.handle_transcript,
+                queue_size=self.transcription_cfg.get('queue_size', 4),
+                sample_rate=self.sample_rate,
+                min_duration=self.transcription_cfg.get('min_duration', 0.3)
+            )
+            self.transcriber.on_error = self.handle_whisper_error
 
     def load_config(self, cfg):
         """Initialize config values."""
+        self.audio_cfg = cfg
         self.sample_rate = cfg['sample_rate']
         self.chunk_size = 512  # 32ms for low-latency
         self.energy_threshold = cfg['energy_threshold']
         self.zcr_threshold = cfg['zcr_threshold']
+        self.vad_cfg = cfg.get('vad', {})
         self.whisper_enabled = cfg['whisper_enabled']
         self.whisper_model_name = cfg['whisper_model']
+        self.whisper_keywords = cfg.get('whisper_keywords', ['help', 'answer', 'whisper'])
+        self.transcription_cfg = cfg.get('transcription', {})
+        self.max_segment_samples = int(self.transcription_cfg.get('max_segment', 15) * self.sample_rate)
 
     def init_state(self):
         """Initialize runtime state."""
         self.running = False
-        self.audio_buffer = deque(maxlen=15)  # ~480ms
+        self.audio_buffer = deque(maxlen=15)  # ~480ms of (sample offset, chunk), pre-roll for utterances
         self.thread = None
         self.alert_system = None
         self.alert_logger = None
-
-    def load_whisper_model(self):
-        """Load Whisper model if enabled."""
-        self.whisper_model = whisper.load_model(self.whisper_model_name)
+        self.on_utterance = None  # optional callback(event) for utterance start/end events
+        self.transcriber = None
+        self.samples_read = 0
+        self.utterance = None
+        self.vad = VoiceActivityDetector(
+            self.vad_cfg, self.energy_threshold, self.zcr_threshold, self.sample_rate, self.chunk_size
+        )
 
     def start(self):
         """Start audio monitoring in a background thread."""
         if not self.running:
             self.running = True
+            if self.transcriber:
+                self.transcriber.start()
             self.thread = threading.Thread(target=self.run, daemon=True)
             self.thread.start()
 
     def stop(self):
         """Stop audio monitoring thread safely."""
         self.running = False
-        if self.thread and self.thread.isalive():
+        if self.thread and self.thread.is_alive():
             self.thread.join(timeout=1)
+        if self.transcriber:
+            self.transcriber.stop()
 
     def run(self):
-        """Continuously monitor audio input and process when voice is detected."""
-        p = pyaudio.PyAudio()
-        stream = p.open(
-            format=pyaudio.paInt16,
-            channels=1,
-            rate=self.sample_rate,
-            input=True,
-            frames_per_buffer=self.chunk_size
-        )
+        """Continuously monitor audio input; the capture loop only does cheap per-chunk work."""
+        source = open_audio_source(self.audio_cfg, self.chunk_size)
 
         try:
             while self.running:
-                data = stream.read(self.chunk_size, exception_on_overflow=False)
-                audio = np.frombuffer(data, dtype=np.int16)
-                self.audio_buffer.append(audio)
-                if self.is_voice(audio):
-                    self.handle_voice_detection()
+                audio = source.read(self.chunk_size)
+                if audio is None:
+                    # End of a WAV source
+                    self.running = False
+                    break
+                self.process_chunk(audio)
         finally:
-            stream.stop_stream()
-            stream.close()
-            p.terminate()
-
-    def is_voice(self, audio):
-        """Fast voice detection based on energy and zero-crossing rate."""
-        audio_norm = audio / 32768.0
-        energy = np.mean(audio_norm**2)
-        if energy < self.energy_threshold:
-            return False
-        zcr = np.mean(np.abs(np.diff(np.sign(audio_norm))))
-        return zcr <= self.zcr_threshold
+            for event in self.vad.finish():
+                self.handle_vad_event(event)
+            source.close()
+
+    def process_chunk(self, audio):
+        """Feed one chunk through the VAD and collect utterance audio for transcription."""
+        offset = self.samples_read
+        self.samples_read += len(audio)
+        self.audio_buffer.append((offset, audio))
+
+        collecting = self.utterance is not None
+        for event in self.vad.process(audio):
+            self.handle_vad_event(event)
+        if collecting and self.utterance is not None:
+            self.utterance.append(audio)
+            if self.samples_read - self.utterance_start >= self.max_segment_samples:
+                # Long speech: transcribe what we have and keep collecting
+                self.submit_utterance(self.samples_read)
+                self.utterance, self.utterance_start = [], self.samples_read
+
+    def handle_vad_event(self, event):
+        if event['event'] == 'start':
+            self.handle_voice_detection(event)
+            if self.transcriber and not self.transcriber.disabled:
+                chunks = [(offset, chunk) for offset, chunk in self.audio_buffer if offset + len(chunk) > event['start_sample']]
+                self.utterance_start = chunks[0][0] if chunks else self.samples_read
+                self.utterance = [chunk for _, chunk in chunks]
+        else:
+            if self.alert_logger:
+                self.alert_logger.log_alert(
+                    "VOICE_DETECTED",
+                    f"Voice activity {event['start']:.1f}-{event['end']:.1f}s ({event['duration']:.1f}s)"
+                )
+            if self.utterance is not None:
+                self.submit_utterance(event['end_sample'])
+                self.utterance = None
 
-    def handle_voice_detection(self):
-        """Trigger alerts and optional speech analysis when voice is detected."""
-        if self.alert_system:
-            self.alert_system.speak_alert("VOICE_DETECTED")
-        if self.alert_logger:
-            self.alert_logger.log_alert("VOICE_DETECTED", "Voice activity detected")
+        if self.on_utterance:
+            self.on_utterance(event)
 
-        if self.whisper_enabled:
-            self.process_with_whisper()
+    def submit_utterance(self, end_sample):
+        if self.utterance:
+            samples = np.concatenate(self.utterance)[:max(0, end_sample - self.utterance_start)]
+            self.transcriber.submit(self.utterance_start, samples)
 
-    def process_with_whisper(self):
-        """Use Whisper to transcribe and analyze recent audio."""
-        try:
-            audio = np.concatenate(self.audio_buffer).astype(np.float32) / 32768.0
-            result = self.whisper_model.transcribe(audio, fp16=False, language='en')
-            text = result.get('text', '').strip().lower()
+    def handle_voice_detection(self, event):
+        """Spoken alert once per utterance, when it starts."""
+        if self.alert_system:
+            self.alert_system.speak_alert("VOICE_DETECTED")
 
-            if any(word in text for word in ['help', 'answer', 'whisper']):
-                if self.alert_system:
-                    self.alert_system.speak_alert("SPEECH_VIOLATION")
-        except Exception as e:
+    def handle_transcript(self, text, start_sample, end_sample):
+        """Called on the transcription thread once per segment."""
+        text = text.lower()
+        if any(word in text for word in self.whisper_keywords):
+            if self.alert_system:
+                self.alert_system.speak_alert("SPEECH_VIOLATION")
             if self.alert_logger:
-                self.alert_logger.log_alert("WHISPER_ERROR", str(e))
+                self.alert_logger.log_alert(
+                    "SPEECH_VIOLATION",
+                    f"Flagged speech at {start_sample / self.sample_rate:.1f}-{end_sample / self.sample_rate:.1f}s: {text}"
+                )
+
+    def handle_whisper_error(self, error):
+        if self.alert_logger:
+            self.alert_logger.log_alert("WHISPER_ERROR", str(error))
@@ -0,0 +1,282 @@
+import importlib
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from detection_system import MODEL_LIBRARIES, load_face_model, load_object_model
+
+
+class BatchInferenceServer:
+    """
+    Collects inference requests from many sessions and runs them as one batch.
+
+    A batch is dispatched when `max_batch_size` requests are waiting or when
+    `max_wait_ms` has passed since the first request of the batch arrived,
+    whichever comes first. Subclasses implement `load_model()` and
+    `run_batch(inputs)`, returning one output per input, in order.
+
+    The model is built on the first batch, or earlier by ModelWarmup; `state`
+    goes idle -> loading -> ready, or failed, in which case every request gets
+    the load error.
+    """
+
+    def __init__(self, name, max_batch_size=8, max_wait_ms=10):
+        self.name = name
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+
+        self.requests = queue.Queue()
+        self.stop_event = threading.Event()
+        self.thread = None
+
+        self.load_lock = threading.Lock()
+        self.state = 'idle'
+        self.error = None
+
+        self.stats_lock = threading.Lock()
+        self.batches = 0
+        self.items = 0
+        self.busy_time = 0.0
+
+    def start(self):
+        if self.thread is None:
+            self.stop_event.clear()
+            self.thread = threading.Thread(target=self.serve, name=f"{self.name}-inference", daemon=True)
+            self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread:
+            self.thread.join(timeout=2)
+            self.thread = None
+
+    def load(self):
+        """Build the model if that has not happened yet; returns True once it is ready."""
+        with self.load_lock:
+            if self.state == 'idle':
+                self.state = 'loading'
+                try:
+                    self.load_model()
+                    self.state = 'ready'
+                except Exception as e:
+                    self.error = e
+                    self.state = 'failed'
+                    print(f"[{type(self).__name__}] Failed to load model: {e}")
+        return self.state == 'ready'
+
+    def submit(self, item):
+        """Queue one input and return a Future for its output."""
+        future = Future()
+        self.requests.put((item, future))
+        return future
+
+    def infer(self, item, timeout=None):
+        """Blocking helper used by the per-session detectors."""
+        return self.submit(item).result(timeout=timeout)
+
+    def collect_batch(self):
+        try:
+            first = self.requests.get(timeout=0.5)
+        except queue.Empty:
+            return []
+
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self.requests.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def serve(self):
+        while not self.stop_event.is_set():
+            batch = self.collect_batch()
+            if not batch:
+                continue
+
+            if not self.load():
+                for _, future in batch:
+                    future.set_exception(RuntimeError(f"{self.name} model failed to load: {self.error}"))
+                continue
+
+            inputs = [item for item, _ in batch]
+            started = time.monotonic()
+            try:
+                outputs = self.run_batch(inputs)
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+
+            with self.stats_lock:
+                self.batches += 1
+                self.items += len(batch)
+                self.busy_time += time.monotonic() - started
+
+            for (_, future), output in zip(batch, outputs):
+                future.set_result(output)
+
+    def load_model(self):
+        raise NotImplementedError
+
+    def run_batch(self, inputs):
+        raise NotImplementedError
+
+    def stats(self):
+        with self.stats_lock:
+            return {
+                'state': self.state,
+                'batches': self.batches,
+                'items': self.items,
+                'avg_batch_size': round(self.items / self.batches, 2) if self.batches else 0,
+                'items_per_second': round(self.items / self.busy_time, 1) if self.busy_time else 0,
+            }
+
+
+class FaceInferenceServer(BatchInferenceServer):
+    """Shared MTCNN; inputs are RGB frames, outputs are (boxes, probs) per frame."""
+
+    def __init__(self, config, **kwargs):
+        super().__init__('faces', **kwargs)
+        self.detector = None
+
+    def load_model(self):
+        self.detector = load_face_model()
+
+    def run_batch(self, inputs):
+        # MTCNN stacks its input, so frames are batched per resolution
+        outputs = [None] * len(inputs)
+        by_shape = {}
+        for index, frame in enumerate(inputs):
+            by_shape.setdefault(frame.shape, []).append(index)
+
+        for indices in by_shape.values():
+            boxes, probs = self.detector.detect([inputs[i] for i in indices])
+            for i, frame_boxes, frame_probs in zip(indices, boxes, probs):
+                outputs[i] = (frame_boxes, frame_probs)
+        return outputs
+
+
+class ObjectInferenceServer(BatchInferenceServer):
+    """Shared YOLOv8n; inputs are downscaled BGR frames, outputs are one ultralytics Result each."""
+
+    def __init__(self, config, **kwargs):
+        super().__init__('objects', **kwargs)
+        self.min_confidence = config['detection']['objects']['min_confidence']
+        self.model = None
+
+    def load_model(self):
+        self.model = load_object_model(self.min_confidence)
+
+    def run_batch(self, inputs):
+        return list(self.model(inputs, verbose=False))
+
+
+class InferenceServices:
+    """Holds the shared face and object servers built from the `inference` config section."""
+
+    def __init__(self, config):
+        inference_cfg = config.get('inference', {})
+        batch_args = {
+            'max_batch_size': inference_cfg.get('max_batch_size', 8),
+            'max_wait_ms': inference_cfg.get('max_wait_ms', 10),
+        }
+        self.faces = FaceInferenceServer(config, **batch_args)
+        self.objects = ObjectInferenceServer(config, **batch_args)
+
+    def start(self):
+        self.faces.start()
+        self.objects.start()
+
+    def stop(self):
+        self.faces.stop()
+        self.objects.stop()
+
+    def stats(self):
+        return {'faces': self.faces.stats(), 'objects': self.objects.stats()}
+
+
+class ModelWarmup:
+    """
+    Imports the detection libraries and loads the shared models on a background
+    thread after the web app has started, so neither /auth/login nor the first
+    proctoring session waits for them. Whisper is only imported when
+    transcription is enabled.
+
+    `state` goes pending -> warming -> ready, or failed if a required step
+    did. Required steps are the ones a session cannot run without: MediaPipe
+    and the shared models (or, without shared servers, their libraries).
+    Failed optional steps such as Whisper are listed in status() but do not
+    hold readiness back. With `inference.warm_up: false` nothing is loaded
+    ahead of time and the state is `disabled`, which counts as ready.
+    """
+
+    def __init__(self, config, inference=None):
+        self.enabled = config.get('inference', {}).get('warm_up', True)
+        self.libraries = list(MODEL_LIBRARIES)
+        if config['detection'].get('audio_monitoring', {}).get('whisper_enabled'):
+            self.libraries.append('whisper')
+        self.inference = inference
+
+        # The model steps already cover torch, facenet_pytorch and ultralytics
+        self.required = {'mediapipe'}
+        if inference:
+            self.required.update(f"{server.name}_model" for server in (inference.faces, inference.objects))
+        else:
+            self.required.update(MODEL_LIBRARIES)
+
+        self.state = 'pending' if self.enabled else 'disabled'
+        self.steps = {}
+        self.errors = {}
+        self.seconds = None
+        self.thread = None
+
+    def start(self):
+        if self.enabled and self.thread is None:
+            self.thread = threading.Thread(target=self.run, name='warm-up', daemon=True)
+            self.thread.start()
+
+    def run(self):
+        self.state = 'warming'
+        started = time.monotonic()
+        for name in self.libraries:
+            self.step(name, importlib.import_module, name)
+        if self.inference:
+            for server in (self.inference.faces, self.inference.objects):
+                self.step(f"{server.name}_model", self.load_server, server)
+        self.seconds = round(time.monotonic() - started, 2)
+        self.state = 'failed' if self.required & set(self.errors) else 'ready'
+
+    def step(self, name, fn, *args):
+        self.steps[name] = 'loading'
+        try:
+            fn(*args)
+            self.steps[name] = 'ready'
+        except Exception as e:
+            self.steps[name] = 'failed'
+            self.errors[name] = str(e)
+            print(f"[ModelWarmup] {name} failed: {e}")
+
+    @staticmethod
+    def load_server(server):
+        if not server.load():
+            raise RuntimeError(server.error)
+
+    @property
+    def ready(self):
+        return self.state in ('ready', 'disabled')
+
+    def status(self):
+        errors = dict(self.errors)
+        return {
+            'state': self.state,
+            'steps': dict(self.steps),
+            'errors': {name: error for name, error in errors.items() if name in self.required},
+            'optional_errors': {name: error for name, error in errors.items() if name not in self.required},
+            'seconds': self.seconds,
+        }
@@ -0,0 +1,87 @@
+"""
+Login throughput test for the auth data-access layer.
+
+Seeds `--users` accounts (loadtest<n>) if they are missing, then has
+`--threads` workers call UserRepository.authenticate, the same path as the
+/auth/login route, and reports logins per second, latency percentiles and
+connection pool statistics.
+
+    python loadtest_login.py --backend sqlite --users 500 --threads 32
+    python loadtest_login.py --backend mysql --pool-size 16
+"""
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import yaml
+from werkzeug.security import generate_password_hash
+
+from database import ConnectionPool, UserRepository
+
+
+PASSWORD = 'loadtest-password'
+
+
+def load_config():
+    with open('config.yaml') as f:
+        return yaml.safe_load(f)
+
+
+def seed_users(users, count, password_hash):
+    created = 0
+    for n in range(count):
+        username = f"loadtest{n}"
+        if users.find_by_username(username) is None:
+            users.create(username, password_hash, f"{username}@loadtest.local", 'student')
+            created += 1
+    return created
+
+
+def timed_login(users, username):
+    started = time.perf_counter()
+    ok = users.authenticate(username, PASSWORD) is not None
+    return ok, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--backend', choices=['mysql', 'sqlite'], help="override database.backend")
+    parser.add_argument('--sqlite-path', help="override database.sqlite_path")
+    parser.add_argument('--pool-size', type=int, help="override database.pool_size")
+    parser.add_argument('--users', type=int, default=500)
+    parser.add_argument('--threads', type=int, default=32)
+    parser.add_argument('--rounds', type=int, default=1, help="logins per user")
+    parser.add_argument('--hash-method', default='scrypt',
+                        help="werkzeug hash method for seeded users, e.g. 'pbkdf2:sha256:1000' to measure the pool alone")
+    args = parser.parse_args()
+
+    config = load_config()
+    db_cfg = config.setdefault('database', {})
+    if args.backend:
+        db_cfg['backend'] = args.backend
+    if args.sqlite_path:
+        db_cfg['sqlite_path'] = args.sqlite_path
+    if args.pool_size:
+        db_cfg['pool_size'] = args.pool_size
+
+    pool = ConnectionPool(config)
+    users = UserRepository(pool)
+    created = seed_users(users, args.users, generate_password_hash(PASSWORD, method=args.hash_method))
+    print(f"Seeded {created} users ({args.users} total), backend={db_cfg.get('backend', 'mysql')}")
+
+    usernames = [f"loadtest{n}" for n in range(args.users)] * args.rounds
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.threads) as executor:
+        results = list(executor.map(lambda username: timed_login(users, username), usernames))
+    elapsed = time.perf_counter() - started
+
+    latencies = np.array([latency for _, latency in results]) * 1000
+    failures = sum(1 for ok, _ in results if not ok)
+    print(f"{len(results)} logins in {elapsed:.2f}s: {len(results) / elapsed:.1f} logins/s, {failures} failed")
+    print("Latency ms: p50={:.1f} p95={:.1f} p99={:.1f} max={:.1f}".format(*np.percentile(latencies, [50, 95, 99, 100])))
+    print(f"Pool: {pool.stats()}")
+
+
+if __name__ == '__main__':
+    main()
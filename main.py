@@ -1,141 +1,127 @@
-from flask import Flask, render_template, request, redirect, url_for, session,flash, Response, send_file
-from flask_mysql_connector import MySQL
-import MySQLdb.cursors
+from flask import Flask, render_template, request, redirect, url_for, session,flash, Response, send_file, jsonify, abort
 import re
 import os
 import sys
+import json
 from werkzeug.security import generate_password_hash
-from werkzeug.security import check_password_hash
 from functools import wraps
-import cv2
 import yaml
+import atexit
 from datetime import datetime, timedelta
 
 
-from detection_system import AudioMonitor, EyeTracker, FaceDetector, MouthMonitor, ObjectDetector, MultiFaceDetector
-from report import AlertSystem, AlertLogger, VideoRecorder, ScreenRecorder, ViolationLogger, ViolationCapturer, ReportGenerator
+from detection_system import AudioMonitor
+from report import AlertSystem, AlertLogger, ScreenRecorder, ViolationLogger, ReportGenerator, ReportJobQueue
+from analytics import CohortAnalytics
+from inference import InferenceServices, ModelWarmup
+from sessions import SessionManager, SessionLimitError, SourceUnavailableError, session_key
+from database import ConnectionPool, ProctoringStore, UserRepository
 
 
 
+# Load config
+with open('config.yaml') as f:
+    config = yaml.safe_load(f)
+
 app = Flask(__name__)
 app.secret_key = os.urandom(24)
 
-app.config['MYSQL_HOST'] = 'localhost'
-app.config['MYSQL_USER'] = 'root'
-app.config['MYSQL_PASSWORD'] = 'Mysql@123' 
-app.config['MYSQL_DATABASE'] = 'exam'
-
+# One bounded connection pool for the auth routes and the violation writer
+db_pool = ConnectionPool(config)
+users = UserRepository(db_pool)
 
-mysql = MySQL(app)
+# Violations and recordings go to the database through one batched background writer
+store = None
+if config.get('database', {}).get('persist'):
+    store = ProctoringStore(config, db_pool)
+    store.start()
+    atexit.register(store.close)
 
-# Load config
-with open('config.yaml') as f:
-    config = yaml.safe_load(f)
-
-# Initialize global resources
+# Initialize process-wide resources; per-student state lives in SessionManager
 alert_logger = AlertLogger(config)
 alert_system = AlertSystem(config)
-capturer = ViolationCapturer(config)
-logger = ViolationLogger(config)
 report_generator = ReportGenerator(config)
-video_recorder = VideoRecorder(config)
+report_jobs = ReportJobQueue(config, report_generator)
 screen_recorder = ScreenRecorder(config)
 audio_monitor = AudioMonitor(config)
 audio_monitor.alert_system = alert_system
 audio_monitor.alert_logger = alert_logger
 
-detectors = [
-    FaceDetector(config),
-    EyeTracker(config),
-    MouthMonitor(config),
-    MultiFaceDetector(config),
-    ObjectDetector(config)
-]
-
-for detector in detectors:
-    if hasattr(detector, 'set_alert_logger'):
-        detector.set_alert_logger(alert_logger)
-
-cap = cv2.VideoCapture(config['video']['source'])
-cap.set(cv2.CAP_PROP_FRAME_WIDTH, config['video']['resolution'][0])
-cap.set(cv2.CAP_PROP_FRAME_HEIGHT, config['video']['resolution'][1])
-
-
-
-def handle_violation(violation_type, frame, results):
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
-    alert_system.speak_alert(violation_type)
-    capturer.capture_violation(frame, violation_type, timestamp)
-    logger.log_violation(
-        violation_type, timestamp,
-        {'duration': '5+ seconds', 'frame': results}
-    )
-
-
-def display_detection_results(frame, results):
-    y_offset = 30
-    line_height = 30
-    status_items = [
-        f"Face: {'Present' if results['face_present'] else 'Absent'}",
-        f"Gaze: {results['gaze_direction']}",
-        f"Eyes: {'Open' if results['eye_ratio'] > 0.25 else 'Closed'}",
-        f"Mouth: {'Moving' if results['mouth_moving'] else 'Still'}"
-    ]
-    alert_items = []
-    if results['multiple_faces']:
-        alert_items.append("Multiple Faces Detected!")
-    if results['objects_detected']:
-        alert_items.append("Suspicious Object Detected!")
-    for item in status_items + alert_items:
-        color = (0, 255, 0) if item in status_items else (0, 0, 255)
-        cv2.putText(frame, item, (10, y_offset), cv2.FONT_HERSHEY_SIMPLEX, 0.7, color, 2)
-        y_offset += line_height
-    cv2.putText(frame, results['timestamp'], (frame.shape[1] - 250, 30),
-                cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
-    return frame
-
-
-def generate_video_stream():
-    video_recorder.start_recording()
-    if config['screen'].get('recording'):
+# Optional shared YOLO/MTCNN servers that batch inference across sessions (models load on first use)
+inference = None
+if config.get('inference', {}).get('shared_server'):
+    inference = InferenceServices(config)
+    inference.start()
+
+# Detection libraries and shared models load in the background; /ready reports progress
+warmup = ModelWarmup(config, inference)
+warmup.start()
+
+session_manager = SessionManager(config, alert_system=alert_system, inference=inference, store=store)
+default_exam_id = config.get('sessions', {}).get('default_exam_id', 1)
+
+
+def get_violations(student_id, exam_id=None):
+    """Violations of a live session, or of a finished one from the database (or its log file)."""
+    exam_id = exam_id or default_exam_id
+    proctoring_session = session_manager.get(student_id, exam_id)
+    if proctoring_session:
+        return proctoring_session.logger.get_violations()
+    if store:
+        return store.get_violations(student_id, exam_id)
+    return ViolationLogger(config, session_id=session_key(student_id, exam_id)).get_violations()
+
+
+def exam_violation_logs(exam_id):
+    """{student_id: violations} for every student with violations in this exam."""
+    if store:
+        return store.exam_violations(exam_id)
+    logs = {}
+    suffix = f"_{exam_id}.jsonl"
+    for name in os.listdir(config['global']['output_path']):
+        if name.startswith('violations_') and name.endswith(suffix):
+            student_id = name[len('violations_'):-len(suffix)]
+            logs[student_id] = get_violations(student_id, exam_id)
+    return logs
+
+
+def live_session_ids():
+    """
+    (student_id, exam_id) for the live-session routes. Students always get their
+    own session; admins must name the student with ?student_id=. Malformed or
+    missing IDs abort with 400 and an unknown student with 404.
+    """
+    try:
+        exam_id = int(request.args.get('exam_id', default_exam_id))
+    except ValueError:
+        abort(400, description="exam_id must be an integer")
+
+    if session.get('role') == 'admin':
+        try:
+            student_id = int(request.args['student_id'])
+        except KeyError:
+            abort(400, description="student_id is required")
+        except ValueError:
+            abort(400, description="student_id must be an integer")
+        require_student(student_id)
+    else:
+        student_id = session['user_id']
+    return student_id, exam_id
+
+
+def require_student(student_id):
+    """Abort with 404 unless student_id belongs to a student account."""
+    student = users.find_by_id(student_id)
+    if student is None or student['role'] != 'student':
+        abort(404, description="No such student")
+
+
+def generate_video_stream(proctoring_session):
+    proctoring_session.start()
+    if config['screen'].get('recording') and screen_recorder.thread is None:
         screen_recorder.start_recording()
 
-    while True:
-        ret, frame = cap.read()
-        if not ret:
-            break
-
-        now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        results = {
-            'face_present': detectors[0].detect_face(frame),
-            'gaze_direction': 'Center',
-            'eye_ratio': 0.3,
-            'mouth_moving': False,
-            'multiple_faces': False,
-            'objects_detected': False,
-            'timestamp': now
-        }
-
-        results['gaze_direction'], results['eye_ratio'] = detectors[1].track_eyes(frame)
-        results['mouth_moving'] = detectors[2].monitor_mouth(frame)
-        results['multiple_faces'] = detectors[3].detect_multiple_faces(frame)
-        results['objects_detected'] = detectors[4].detect_objects(frame)
-
-        # Handle violations
-        if not results['face_present']:
-            handle_violation("FACE_DISAPPEARED", frame, results)
-        elif results['multiple_faces']:
-            handle_violation("MULTIPLE_FACES", frame, results)
-        elif results['objects_detected']:
-            handle_violation("OBJECT_DETECTED", frame, results)
-        elif results['mouth_moving']:
-            handle_violation("MOUTH_MOVING", frame, results)
-
-        frame = display_detection_results(frame, results)
-        video_recorder.record_frame(frame)
-
-        _, buffer = cv2.imencode('.jpg', frame)
-        frame_bytes = buffer.tobytes()
+    for _, frame_bytes in proctoring_session.frames():
         yield (b'--frame\r\n'
                b'Content-Type: image/jpeg\r\n\r\n' + frame_bytes + b'\r\n')
 
@@ -175,12 +161,8 @@ def login():
             flash("Please enter both username and password.", "warning")
             return render_template('auth/login.html', title="Login")
 
-        cursor = mysql.connection.cursor(dictionary=True)
-        cursor.execute("SELECT * FROM users WHERE username = %s", (username,))
-        user = cursor.fetchone()
-        cursor.close()
-
-        if user and check_password_hash(user['password_hash'], password):
+        user = users.authenticate(username, password)
+        if user:
             session['loggedin'] = True
             session['user_id'] = user['user_id']
             session['username'] = user['username']
@@ -221,24 +203,17 @@ def register():
             return render_template('auth/register.html', title="Register")
 
         # Check for existing user
-        cursor = mysql.connection.cursor(MySQLdb.cursors.DictCursor)
-        cursor.execute("SELECT * FROM users WHERE username = %s OR email = %s", (username, email))
-        account = cursor.fetchone()
-        
-
-        if account:
+        if users.exists(username, email):
             flash("An account with that username or email already exists.", "danger")
             return render_template('auth/register.html', title="Register")
 
         # Hash the password
         password_hash = generate_password_hash(password)
 
-        # Insert new user
-        cursor.execute("""
-            INSERT INTO Users (username, password_hash, email, role)
-            VALUES (%s, %s, %s, %s)
-        """, (username, password_hash, email, role))
-        mysql.connection.commit()
+        # Insert new user; a concurrent registration can still win the unique keys
+        if users.create(username, password_hash, email, role) is None:
+            flash("An account with that username or email already exists.", "danger")
+            return render_template('auth/register.html', title="Register")
 
         flash("You have successfully registered! Please log in.", "success")
         return redirect(url_for('login'))
@@ -255,8 +230,13 @@ def home():
 @app.route('/home')
 @role_required('admin')
 def admin_dashboard():
-    # put whatever admin sees here; e.g. recent exams, metrics, etc.
-    return render_template('home/home.html',username=session['username'],title="Admin Dashboard")
+    # The proctor picks one of the live sessions to watch with ?student_id=
+    live_students = session_manager.student_ids(default_exam_id)
+    watched_student = request.args.get('student_id', type=int)
+    if watched_student not in live_students:
+        watched_student = None
+    return render_template('home/home.html', username=session['username'], title="Admin Dashboard",
+                           live_students=live_students, watched_student=watched_student)
 
 @app.route('/student')
 @role_required('student')
@@ -290,37 +270,111 @@ def student_dashboard():
             )   
 
 @app.route('/video_feed')
+@login_required
 def video_feed():
-    return Response(generate_video_stream(), mimetype='multipart/x-mixed-replace; boundary=frame')
+    student_id, exam_id = live_session_ids()
+
+    # Students start their own session; proctors only subscribe to a running one,
+    # so watching never opens a second capture or detector stack
+    if session.get('role') == 'admin':
+        proctoring_session = session_manager.get(student_id, exam_id)
+        if proctoring_session is None or proctoring_session.ended:
+            abort(404, description="No live session for this student")
+    else:
+        try:
+            proctoring_session = session_manager.get_or_create(student_id, exam_id)
+        except (SessionLimitError, SourceUnavailableError) as e:
+            return Response(str(e), status=503)
+    return Response(generate_video_stream(proctoring_session), mimetype='multipart/x-mixed-replace; boundary=frame')
+
+
+@app.route('/alerts/stream')
+@login_required
+def alert_stream():
+    """Server-sent events with the session's alerts and violations as they happen."""
+    student_id, exam_id = live_session_ids()
+
+    # Only an already running session is streamed; opening this endpoint never starts a camera.
+    # 204 tells EventSource not to reconnect (the student page retries until video_feed starts one)
+    proctoring_session = session_manager.get(student_id, exam_id)
+    if proctoring_session is None:
+        return Response(status=204)
+
+    # EventSource sends Last-Event-ID on reconnect; ?last_event_id= allows a manual resume
+    last_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id') or 0
+    try:
+        last_id = int(last_id)
+    except ValueError:
+        last_id = 0
+
+    def stream(last_id):
+        yield "retry: 2000\n\n"
+        while not proctoring_session.events.closed:
+            events = proctoring_session.events.wait(last_id, timeout=15)
+            if not events:
+                yield ": keep-alive\n\n"
+                continue
+            for event_id, kind, data in events:
+                last_id = event_id
+                yield f"id: {event_id}\nevent: {kind}\ndata: {json.dumps(data, default=str)}\n\n"
+
+    return Response(stream(last_id), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+def report_student_id(requested_id=None):
+    """
+    Admins may act on any student (400 for a malformed ID, 404 for an unknown
+    one); students only on themselves.
+    """
+    if session.get('role') != 'admin' or requested_id is None:
+        return session['user_id']
+    try:
+        student_id = int(requested_id)
+    except ValueError:
+        abort(400, description="student_id must be an integer")
+    if student_id != session['user_id']:
+        require_student(student_id)
+    return student_id
 
 
 @app.route('/download_report')
 @login_required
 def download_report():
+    student_id = report_student_id(request.args.get('student_id'))
     student_info = {
-        'id': 'STUDENT_001',
-        'name': session.get('username', 'John David'),
+        'id': str(student_id),
+        'name': session.get('username', 'John David') if student_id == session['user_id'] else f"Student {student_id}",
         'exam': 'Final Examination',
         'course': 'Computer Science 101'
     }
 
-    violations = logger.get_violations()
+    job = report_jobs.submit_pdf(student_info, get_violations(student_id))
+    return redirect(url_for('report_status', job_id=job['id']))
 
-    report_path = report_generator.generate_report_fpdf(student_info, violations)
-    
-    if report_path:
-        return send_file(report_path, as_attachment=True)
-    else:
+
+@app.route('/report_status/<job_id>')
+@login_required
+def report_status(job_id):
+    job = report_jobs.get(job_id)
+    if job is None or (session.get('role') != 'admin' and job['student_id'] != str(session['user_id'])):
+        abort(404)
+
+    if request.args.get('format') == 'json':
+        return jsonify({key: job[key] for key in ('id', 'kind', 'status', 'error')})
+
+    if job['status'] == 'done':
+        return send_file(job['result'], as_attachment=True)
+    if job['status'] == 'failed':
         flash("Failed to generate report.", "danger")
         return redirect(url_for('home'))
-    
-@app.route('/base_report/<student_id>')
+    return render_template('home/report_status.html', job=job, title="Generating Report")
+
+
+@app.route('/base_report/<int:student_id>')
 @login_required
 def preview_report(student_id):
-    # Example: fetch student info and violations from DB or logger
-    # For demo, let's hardcode or fetch from wherever you store them
-
-    # Sample student info (replace with DB fetch)
+    student_id = report_student_id(student_id)
     student_info = {
         'id': student_id,
         'name': 'John David',
@@ -328,28 +382,38 @@ def preview_report(student_id):
         'course': 'Computer Science 101'
     }
 
-    # Sample violations list (replace with real data)
-    violations = logger.get_violations()  # or your source of violation dicts
+    violations = get_violations(student_id)
 
-    # Create report data like in ReportGenerator but render HTML directly
-    report_generator = ReportGenerator(config)
+    # The HTML preview has no charts; they are only rendered for the PDF report
     report_data = {
         'student': student_info,
         'violations': violations,
         'generated_at': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
         'stats': report_generator.calculate_stats(violations),
-        'timeline_image': report_generator.generate_timeline(violations, student_id),
-        'heatmap_image': report_generator.generate_heatmap(violations, student_id),
         'severity_map': report_generator.severity_map,
-        'has_images': True  # or check if images exist
     }
 
     return render_template('home/base_report.html', **report_data)
     
 
 
+@app.route('/analytics/<int:exam_id>')
+@role_required('admin')
+def exam_analytics(exam_id):
+    cohort = CohortAnalytics(exam_violation_logs(exam_id), report_generator.severity_map)
+    return jsonify(cohort.summary())
+
+
+@app.route('/ready')
+def readiness():
+    """200 once the required libraries and shared models are loaded (or warm-up is off), 503 otherwise."""
+    return jsonify(warmup.status()), 200 if warmup.ready else 503
+
+
 @app.route('/logout')
 def logout():
+    if session.get('user_id') is not None:
+        session_manager.close(session['user_id'], default_exam_id)
     session.clear()
     flash("You have been logged out.", "info")
     response = render_template('auth/login.html')
@@ -0,0 +1,463 @@
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import cv2
+
+from detection_system import FrameContext
+
+
+def put_latest(q, item):
+    """
+    Puts an item on a bounded queue, discarding the oldest entry when full.
+    Returns True if something was dropped.
+    """
+    dropped = False
+    while True:
+        try:
+            q.put_nowait(item)
+            return dropped
+        except queue.Full:
+            try:
+                q.get_nowait()
+                dropped = True
+            except queue.Empty:
+                pass
+
+
+def put_blocking(q, item, stop_event):
+    """Puts an item on a bounded queue, waiting for room; gives up (returns False) once stop_event is set."""
+    while not stop_event.is_set():
+        try:
+            q.put(item, timeout=0.5)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def default_results(timestamp=None):
+    return {
+        'face_present': True,
+        'gaze_direction': 'Center',
+        'eye_ratio': 0.3,
+        'mouth_moving': False,
+        'multiple_faces': False,
+        'objects_detected': False,
+        'timestamp': timestamp or datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    }
+
+
+def display_detection_results(frame, results):
+    """Draw the detector status and alerts onto the frame (in place) and return it."""
+    y_offset = 30
+    line_height = 30
+    status_items = [
+        f"Face: {'Present' if results['face_present'] else 'Absent'}",
+        f"Gaze: {results['gaze_direction']}",
+        f"Eyes: {'Open' if results['eye_ratio'] > 0.25 else 'Closed'}",
+        f"Mouth: {'Moving' if results['mouth_moving'] else 'Still'}"
+    ]
+    alert_items = []
+    if results['multiple_faces']:
+        alert_items.append("Multiple Faces Detected!")
+    if results['objects_detected']:
+        alert_items.append("Suspicious Object Detected!")
+    for item in status_items + alert_items:
+        color = (0, 255, 0) if item in status_items else (0, 0, 255)
+        cv2.putText(frame, item, (10, y_offset), cv2.FONT_HERSHEY_SIMPLEX, 0.7, color, 2)
+        y_offset += line_height
+    cv2.putText(frame, results['timestamp'], (frame.shape[1] - 250, 30),
+                cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
+    return frame
+
+
+class DetectorScheduler:
+    """
+    Decides which detector group runs on the current frame.
+
+    Each group ('faces' = MTCNN, 'landmarks' = face mesh, 'objects' = YOLO) has a
+    target rate and a latency budget from the `scheduler` section of config.yaml.
+    A group whose measured latency exceeds its budget is slowed down in
+    proportion. When a detection cycle takes longer than one camera frame,
+    the group with the highest `shed_order` that can still back off is slowed
+    first; once there is headroom again, back-off is undone in reverse order.
+    Between runs the group's last result is served from cache.
+
+    With realtime=False (file sources read as fast as possible) groups are
+    scheduled on media time at their configured rate and never backed off, so
+    re-running a recording gives the same detector coverage on any hardware.
+    """
+
+    DEFAULTS = {
+        'faces': {'rate': 6, 'budget_ms': 80, 'min_rate': 1, 'shed_order': 1},
+        'landmarks': {'rate': 15, 'budget_ms': 40, 'min_rate': 5, 'shed_order': 0},
+        'objects': {'rate': 5, 'budget_ms': 120, 'min_rate': 0.5, 'shed_order': 2},
+    }
+    BACKOFF_STEP = 1.25
+    EMA_ALPHA = 0.2
+
+    def __init__(self, config, initial_results=None, realtime=True):
+        sched_cfg = config.get('scheduler', {})
+        self.frame_interval = 1.0 / config['video']['fps']
+        self.realtime = realtime
+
+        self.lock = threading.Lock()
+        self.cycle_time = 0.0
+        self.tasks = {}
+        for name, defaults in self.DEFAULTS.items():
+            task_cfg = dict(defaults, **sched_cfg.get(name, {}))
+            self.tasks[name] = {
+                'rate': float(task_cfg['rate']),
+                'budget': task_cfg['budget_ms'] / 1000.0,
+                'min_rate': float(task_cfg['min_rate']),
+                'shed_order': task_cfg['shed_order'],
+                'backoff': 1.0,
+                'latency': 0.0,
+                'last_run': 0.0,
+                'result': (initial_results or {}).get(name),
+                'runs': 0,
+            }
+
+    def effective_rate(self, name):
+        task = self.tasks[name]
+        if not self.realtime:
+            return task['rate']
+        rate = task['rate'] / task['backoff']
+        if task['latency'] > task['budget'] > 0:
+            rate *= task['budget'] / task['latency']
+        return max(task['min_rate'], rate)
+
+    def due(self, name, now=None):
+        now = now if now is not None else time.monotonic()
+        task = self.tasks[name]
+        return now - task['last_run'] >= 1.0 / self.effective_rate(name)
+
+    def run(self, name, fn, *args, now=None):
+        """Run a group, record its latency and cache its result. `now` is the schedule clock, if not monotonic time."""
+        start = time.monotonic()
+        result = fn(*args)
+        latency = time.monotonic() - start
+
+        with self.lock:
+            task = self.tasks[name]
+            task['latency'] = latency if not task['runs'] else (
+                self.EMA_ALPHA * latency + (1 - self.EMA_ALPHA) * task['latency'])
+            task['last_run'] = start if now is None else now
+            task['result'] = result
+            task['runs'] += 1
+        return result
+
+    def last_result(self, name):
+        return self.tasks[name]['result']
+
+    def end_cycle(self, cycle_seconds):
+        """Adjust back-off from the smoothed duration of full detection cycles."""
+        with self.lock:
+            self.cycle_time = self.EMA_ALPHA * cycle_seconds + (1 - self.EMA_ALPHA) * self.cycle_time
+            if not self.realtime:
+                return
+            by_cost = sorted(self.tasks.values(), key=lambda t: t['shed_order'], reverse=True)
+            if self.cycle_time > self.frame_interval:
+                for task in by_cost:
+                    if task['rate'] / task['backoff'] > task['min_rate']:
+                        task['backoff'] *= self.BACKOFF_STEP
+                        break
+            elif self.cycle_time < 0.5 * self.frame_interval:
+                for task in reversed(by_cost):
+                    if task['backoff'] > 1.0:
+                        task['backoff'] = max(1.0, task['backoff'] / self.BACKOFF_STEP)
+                        break
+
+    def stats(self):
+        with self.lock:
+            return {
+                name: {
+                    'rate': round(self.effective_rate(name), 2),
+                    'latency_ms': round(task['latency'] * 1000, 1),
+                    'runs': task['runs'],
+                }
+                for name, task in self.tasks.items()
+            }
+
+
+class FrameBroadcaster:
+    """
+    Fans one producer's encoded frames out to any number of viewers.
+
+    Each subscriber gets its own small queue; when a viewer cannot keep up, its
+    oldest frame is dropped so a slow client never stalls the pipeline or the
+    other viewers.
+    """
+
+    def __init__(self, queue_size=2):
+        self.queue_size = queue_size
+        self.lock = threading.Lock()
+        self.subscribers = set()
+        self.dropped = 0
+
+    def subscribe(self):
+        subscriber = queue.Queue(maxsize=self.queue_size)
+        with self.lock:
+            self.subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self.lock:
+            self.subscribers.discard(subscriber)
+
+    def has_subscribers(self):
+        with self.lock:
+            return bool(self.subscribers)
+
+    def publish(self, item):
+        with self.lock:
+            subscribers = list(self.subscribers)
+        for subscriber in subscribers:
+            if put_latest(subscriber, item):
+                self.dropped += 1
+
+
+class DetectionPipeline:
+    """
+    Runs capture, detection and recording/encoding as separate stages connected
+    by bounded queues, so the output frame rate follows the camera instead of
+    the sum of every stage's latency.
+
+    Drop policy:
+      * capture -> detect: a single slot holding only the newest frame; the
+        detector always works on the most recent frame and skips stale ones.
+      * capture -> encode: every frame is annotated with the latest detection
+        results; when the encoder falls behind, the oldest queued frame is dropped.
+      * encode -> viewers: each frame is JPEG-encoded once and broadcast to every
+        subscriber; a slow viewer loses its oldest frames instead of holding
+        back recording or the other viewers.
+
+    Sources that are not realtime (video files or image sequences read as fast
+    as possible) get backpressure instead: capture waits for the detector, so
+    every frame is analysed, and frames carry the source's media time.
+    """
+
+    def __init__(self, config, cap, face_detection, face_mesh, detectors,
+                 on_violations=None, annotate=None, video_recorder=None, encode_jpeg=True):
+        pipeline_cfg = config.get('pipeline', {})
+        self.queue_size = pipeline_cfg.get('queue_size', 2)
+        self.detector_workers = pipeline_cfg.get('detector_workers', 3)
+
+        self.cap = cap
+        self.realtime = getattr(cap, 'realtime', True)
+        self.face_detection = face_detection
+        self.face_mesh = face_mesh
+        self.detectors = detectors
+        self.on_violations = on_violations
+        self.annotate = annotate
+        self.video_recorder = video_recorder
+        self.encode_jpeg = encode_jpeg
+
+        self.detect_queue = queue.Queue(maxsize=1)
+        self.encode_queue = queue.Queue(maxsize=self.queue_size)
+        self.broadcaster = FrameBroadcaster(self.queue_size)
+
+        self.results_lock = threading.Lock()
+        self.latest_results = default_results()
+        self.scheduler = DetectorScheduler(config, initial_results={
+            'faces': (True, False, 1.0, 0.0),
+            'landmarks': (('Center', 0.3), False),
+            'objects': (False, 0.0),
+        }, realtime=self.realtime)
+
+        self.stop_event = threading.Event()
+        self.threads = []
+        self.executor = None
+        self.running = False
+        self.frame_id = 0
+        self.dropped = {'detect': 0, 'encode': 0}
+        self.errors = 0
+
+    def start(self):
+        """Start capture, detection and encoding threads (no-op if already running)."""
+        if self.running:
+            return
+        self.running = True
+        self.stop_event.clear()
+
+        if self.video_recorder:
+            self.video_recorder.start_recording()
+
+        self.executor = ThreadPoolExecutor(max_workers=self.detector_workers)
+        self.threads = [
+            threading.Thread(target=self.capture_loop, daemon=True),
+            threading.Thread(target=self.detect_loop, daemon=True),
+            threading.Thread(target=self.encode_loop, daemon=True),
+        ]
+        for thread in self.threads:
+            thread.start()
+
+    def stop(self):
+        """Stop all stages and return the recording metadata, if any."""
+        if not self.running:
+            return None
+        self.stop_event.set()
+        for thread in self.threads:
+            thread.join(timeout=2)
+        self.threads = []
+        self.executor.shutdown(wait=True)
+        self.running = False
+
+        if self.video_recorder:
+            return self.video_recorder.stop_recording()
+        return None
+
+    @property
+    def ended(self):
+        """True once the source ran out or failed while the pipeline was running."""
+        return self.running and self.stop_event.is_set()
+
+    def wait(self):
+        """Block until a finite source is exhausted and every stage has drained, then stop."""
+        for thread in self.threads:
+            thread.join()
+        return self.stop()
+
+    def frames(self):
+        """
+        Subscribe to the encoder output and yield (annotated_frame, jpeg_bytes)
+        items. Every caller sees the same frames; none of them triggers extra detection.
+        """
+        subscriber = self.broadcaster.subscribe()
+        try:
+            while not (self.stop_event.is_set() and subscriber.empty()):
+                try:
+                    yield subscriber.get(timeout=0.5)
+                except queue.Empty:
+                    continue
+        finally:
+            self.broadcaster.unsubscribe(subscriber)
+
+    def capture_loop(self):
+        while not self.stop_event.is_set():
+            ret, frame = self.cap.read()
+            if not ret:
+                self.stop_event.set()
+                break
+
+            self.frame_id += 1
+            ctx = FrameContext(frame, self.frame_id, getattr(self.cap, 'frame_time', None))
+
+            # The encoder draws on its own copy so the detector never sees overlay text;
+            # with no recorder and no viewer (e.g. batch analysis) there is nothing to encode for
+            encode = self.video_recorder is not None or self.broadcaster.has_subscribers()
+            if not self.realtime:
+                put_blocking(self.detect_queue, ctx, self.stop_event)
+                if encode:
+                    put_blocking(self.encode_queue, (frame.copy(), ctx.timestamp), self.stop_event)
+                continue
+            if put_latest(self.detect_queue, ctx):
+                self.dropped['detect'] += 1
+            if encode and put_latest(self.encode_queue, (frame.copy(), ctx.timestamp)):
+                self.dropped['encode'] += 1
+
+    def detect_loop(self):
+        # File sources finish the frames already queued when capture reaches the end
+        while not self.stop_event.is_set() or (not self.realtime and not self.detect_queue.empty()):
+            try:
+                ctx = self.detect_queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+
+            started = time.monotonic()
+            try:
+                results = self.detect(ctx)
+            except Exception as e:
+                # One bad frame or detector error must not end detection for the session
+                self.errors += 1
+                print(f"[DetectionPipeline] Detection failed on frame {ctx.frame_id}: {e}")
+                continue
+            self.scheduler.end_cycle(time.monotonic() - started)
+
+            with self.results_lock:
+                self.latest_results = results
+
+    def detect(self, ctx):
+        """
+        Run the detector groups that are due on this frame (in parallel), reuse
+        cached results for the rest, and report every violation condition that
+        currently holds (possibly none) to on_violations.
+        """
+        face_detector, eye_tracker, mouth_monitor, multi_face_detector, object_detector = self.detectors
+
+        def run_faces():
+            faces = self.face_detection.detect(ctx)
+            return (face_detector.detect_face(ctx), multi_face_detector.detect_multiple_faces(ctx),
+                    faces.confidence, faces.confidence_at(1))
+
+        def run_landmarks():
+            self.face_mesh.process(ctx)
+            return eye_tracker.track_eyes(ctx), mouth_monitor.monitor_mouth(ctx)
+
+        groups = {
+            'faces': run_faces,
+            'landmarks': run_landmarks,
+            'objects': lambda: (object_detector.detect_objects(ctx), object_detector.last_confidence),
+        }
+
+        # MTCNN, face mesh and YOLO release the GIL, so the due groups overlap
+        now = time.monotonic() if self.realtime else ctx.timestamp.timestamp()
+        jobs = [
+            self.executor.submit(self.scheduler.run, name, fn, now=None if self.realtime else now)
+            for name, fn in groups.items() if self.scheduler.due(name, now)
+        ]
+        for job in jobs:
+            job.result()
+
+        results = default_results(ctx.timestamp.strftime("%Y-%m-%d %H:%M:%S"))
+        results['face_present'], results['multiple_faces'], face_conf, second_face_conf = self.scheduler.last_result('faces')
+        (results['gaze_direction'], results['eye_ratio']), results['mouth_moving'] = self.scheduler.last_result('landmarks')
+        results['objects_detected'], object_conf = self.scheduler.last_result('objects')
+
+        # Violation type -> confidence of the condition on this frame
+        violations = {}
+        if not results['face_present']:
+            violations['FACE_DISAPPEARED'] = 1.0 - face_conf
+        if results['multiple_faces']:
+            violations['MULTIPLE_FACES'] = second_face_conf
+        if results['objects_detected']:
+            violations['OBJECT_DETECTED'] = object_conf
+        if results['mouth_moving']:
+            violations['MOUTH_MOVING'] = 1.0
+
+        if self.on_violations:
+            self.on_violations(violations, ctx.frame, results, ctx.timestamp)
+
+        return results
+
+    def encode_loop(self):
+        while not (self.stop_event.is_set() and self.encode_queue.empty()):
+            try:
+                frame, captured_at = self.encode_queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+
+            with self.results_lock:
+                results = dict(self.latest_results)
+            results['timestamp'] = captured_at.strftime("%Y-%m-%d %H:%M:%S")
+
+            # The recorder takes the raw frame when it stores the overlay as metadata
+            raw_recording = self.video_recorder and not self.video_recorder.burn_overlay
+            if raw_recording:
+                self.video_recorder.record_frame(frame, results)
+            if self.annotate:
+                self.annotate(frame, results)
+            if self.video_recorder and not raw_recording:
+                self.video_recorder.record_frame(frame)
+
+            if not self.broadcaster.has_subscribers():
+                continue
+
+            jpeg = None
+            if self.encode_jpeg:
+                _, buffer = cv2.imencode('.jpg', frame)
+                jpeg = buffer.tobytes()
+            self.broadcaster.publish((frame, jpeg))
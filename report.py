@@ -1,26 +1,164 @@
 import os
-import tempfile
+import hashlib
+import queue
 import time
 import threading
-from gtts import gTTS
-import pygame
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 import json
+from collections import deque, OrderedDict
 from datetime import datetime
 
-from fpdf import FPDF
-
 import cv2
 import numpy as np
-from mss import mss
-
 
-import pdfkit
-import matplotlib
-matplotlib.use('Agg')  # Use non-interactive backend
+# matplotlib, pdfkit, fpdf, mss, gTTS and pygame are imported where they are used,
+# so the web app does not load them (or open an audio device) before it can serve pages.
 from jinja2 import Environment, FileSystemLoader
-import matplotlib.pyplot as plt
 import logging
 
+from analytics import ViolationColumns, parse_timestamps
+
+
+def violation_log_version(violations):
+    """Identifies the state of an append-only violation log."""
+    if not violations:
+        return 'empty'
+    last = violations[-1]
+    digest = hashlib.sha1(f"{len(violations)}:{last['timestamp']}:{last['type']}".encode('utf-8'))
+    return digest.hexdigest()[:12]
+
+
+class ChartRenderer:
+    """
+    Keeps one matplotlib Figure per (chart, student) and redraws it only when
+    the data behind it has changed. At most `max_charts` are kept; the least
+    recently used one is dropped together with its PNG.
+
+    Violation logs are append-only, so the timeline is extended with just the
+    entries added since the last render; a log that no longer extends the one
+    already drawn is redrawn from scratch. Figures use the object API rather
+    than pyplot, so different charts can render concurrently.
+    """
+
+    def __init__(self, image_dir, severity_map, max_charts=32):
+        self.image_dir = image_dir
+        self.severity_map = severity_map
+        self.max_charts = max_charts
+        self.lock = threading.Lock()
+        self.charts = OrderedDict()
+
+    def chart(self, kind, student_id, figsize, margins):
+        key = (kind, str(student_id))
+        with self.lock:
+            chart = self.charts.pop(key, None)
+            if chart is None:
+                from matplotlib.backends.backend_agg import FigureCanvasAgg
+                from matplotlib.figure import Figure
+
+                figure = Figure(figsize=figsize)
+                FigureCanvasAgg(figure)
+                # Fixed margins instead of tight_layout/bbox_inches='tight', which cost an extra draw per save
+                figure.subplots_adjust(**margins)
+                chart = {
+                    'figure': figure,
+                    'axes': figure.add_subplot(111),
+                    'lock': threading.Lock(),
+                    'version': None,
+                    'data': None,
+                    'path': os.path.join(self.image_dir, f'{kind}_{student_id}.png'),
+                }
+            self.charts[key] = chart
+            while len(self.charts) > self.max_charts:
+                _, evicted = self.charts.popitem(last=False)
+                try:
+                    os.remove(evicted['path'])
+                except OSError:
+                    pass
+            return chart
+
+    def save(self, chart, version):
+        # Fast zlib level: the PNGs are small and rewritten on every change
+        chart['figure'].savefig(chart['path'], dpi=150, pil_kwargs={'compress_level': 1})
+        chart['version'] = version
+        return chart['path']
+
+    def is_fresh(self, chart, version):
+        return chart['version'] == version and os.path.exists(chart['path'])
+
+    def timeline(self, violations, student_id):
+        chart = self.chart('timeline', student_id, (12, 5), {'left': 0.06, 'right': 0.98, 'top': 0.92, 'bottom': 0.22})
+        version = violation_log_version(violations)
+        with chart['lock']:
+            if self.is_fresh(chart, version):
+                return chart['path']
+
+            ax = chart['axes']
+            data = chart['data']
+            if data is None or len(violations) < data['count'] or violations[data['count'] - 1]['timestamp'] != data['last']:
+                ax.clear()
+                ax.set_title(f"Violation Timeline - {student_id}")
+                ax.set_xlabel("Time")
+                ax.set_ylabel("Severity Level")
+                ax.grid(True, linestyle='--', alpha=0.7)
+                ax.xaxis_date()
+                ax.tick_params(axis='x', labelrotation=45)
+                data = chart['data'] = {
+                    'line': ax.plot([], [], 'o-', markersize=8)[0],
+                    'times': [],
+                    'severities': [],
+                    'count': 0,
+                    'last': None,
+                }
+
+            from matplotlib.dates import date2num
+
+            added = violations[data['count']:]
+            times = date2num(parse_timestamps([v['timestamp'] for v in added]))
+            previous_type = violations[data['count'] - 1]['type'] if data['count'] else None
+            for v, t in zip(added, times.tolist()):
+                s = self.severity_map.get(v['type'], 1)
+                data['times'].append(t)
+                data['severities'].append(s)
+                # Label only where the type changes; text is most of the draw time and repeats just overlap
+                if v['type'] != previous_type:
+                    ax.annotate(v['type'], (t, s), textcoords="offset points", xytext=(0, 10), ha='center', fontsize=8)
+                previous_type = v['type']
+
+            data['count'] = len(violations)
+            data['last'] = violations[-1]['timestamp']
+            data['line'].set_data(data['times'], data['severities'])
+            ax.relim()
+            ax.autoscale_view()
+            return self.save(chart, version)
+
+    def heatmap(self, counts, student_id):
+        types, values = zip(*sorted(counts.items(), key=lambda x: x[1], reverse=True))
+        version = hashlib.sha1(repr((types, values)).encode('utf-8')).hexdigest()[:12]
+        chart = self.chart('heatmap', student_id, (10, 5), {'left': 0.22, 'right': 0.95, 'top': 0.9, 'bottom': 0.12})
+        with chart['lock']:
+            if self.is_fresh(chart, version):
+                return chart['path']
+
+            # A handful of bars; redrawing them is cheaper than diffing
+            ax = chart['axes']
+            ax.clear()
+            from matplotlib import colormaps
+
+            colors = [colormaps['Reds'](self.severity_map.get(t, 1) / 5) for t in types]
+            bars = ax.barh(types, values, color=colors, edgecolor='black', linewidth=0.7)
+
+            for bar in bars:
+                width = bar.get_width()
+                ax.text(width + 0.3, bar.get_y() + bar.get_height() / 2, str(int(width)), va='center', ha='left', fontsize=10)
+
+            ax.set_title(f"Violation Frequency - {student_id}")
+            ax.set_xlabel("Count")
+            ax.set_ylabel("Violation Type")
+            ax.grid(True, linestyle='--', alpha=0.3, axis='x')
+            return self.save(chart, version)
+
+
 class ReportGenerator:
     def __init__(self, config):
         self.config = config.get('reporting', {})
@@ -44,6 +182,8 @@ class ReportGenerator:
             'OBJECT_DETECTED': 5,
             'AUDIO_DETECTED': 3
         }
+
+        self.charts = ChartRenderer(self.image_dir, self.severity_map, self.config.get('chart_cache_size', 32))
         
     def generate_report(self, student_info, violations, output_format='pdf'):
         try:
@@ -72,6 +212,8 @@ class ReportGenerator:
                     'margin-bottom': '10mm',
                     'margin-left': '10mm'
                 }
+                import pdfkit
+
                 wkhtmltopdf_path = self.config.get('wkhtmltopdf_path')
                 config = pdfkit.configuration(wkhtmltopdf=wkhtmltopdf_path) if wkhtmltopdf_path else None
                 pdfkit.from_string(html_content, output_path, options=options, configuration=config)
@@ -86,8 +228,10 @@ class ReportGenerator:
             self.logger.error(f"Failed to generate report: {e}")
             return None
 
-    def generate_report_fpdf(self, student_info, violations):
+    def generate_report_fpdf(self, student_info, violations, output_path=None):
         try:
+            from fpdf import FPDF
+
             pdf = FPDF()
             pdf.set_auto_page_break(auto=True, margin=15)
             pdf.add_page()
@@ -155,8 +299,9 @@ class ReportGenerator:
                         pdf.ln(5)
 
             # Save PDF
-            filename = f"report_{student_info['id']}_{datetime.now():%Y%m%d_%H%M%S}.pdf"
-            output_path = os.path.join(self.output_dir, filename)
+            if output_path is None:
+                filename = f"report_{student_info['id']}_{datetime.now():%Y%m%d_%H%M%S}.pdf"
+                output_path = os.path.join(self.output_dir, filename)
             pdf.output(output_path)
 
             self.logger.info(f"PDF report generated at: {output_path}")
@@ -166,47 +311,18 @@ class ReportGenerator:
             self.logger.error(f"Failed to generate fpdf2 report: {e}")
             return None
 
-    def calculate_stats(self, violations):
-        stats = {'total': len(violations), 'by_type': {}, 'timeline': [], 'severity_score': 0}
-
-        for violation in violations:
-            vtype = violation['type']
-            severity = self.severity_map.get(vtype, 1)
-            stats['by_type'][vtype] = stats['by_type'].get(vtype, 0) + 1
-            stats['timeline'].append({'time': violation['timestamp'], 'type': vtype, 'severity': severity})
-            stats['severity_score'] += severity
+    def analyze(self, violations):
+        """Columnar view of a violation log for vectorised stats (see analytics.py)."""
+        return ViolationColumns(violations, self.severity_map)
 
-        stats['average_severity'] = (stats['severity_score'] / stats['total']) if stats['total'] else 0
-        return stats
+    def calculate_stats(self, violations):
+        return self.analyze(violations).stats()
 
     def generate_timeline(self, violations, student_id):
         if not violations:
             return None
         try:
-            times, severities, labels = [], [], []
-            for v in violations:
-                times.append(datetime.strptime(v['timestamp'], "%Y%m%d_%H%M%S_%f"))
-                labels.append(v['type'])
-                severities.append(self.severity_map.get(v['type'], 1))
-
-            plt.figure(figsize=(12, 5))
-            plt.plot(times, severities, 'o-', markersize=8)
-
-            for t, s, l in zip(times, severities, labels):
-                plt.annotate(l, (t, s), textcoords="offset points", xytext=(0, 10), ha='center', fontsize=8)
-
-            plt.title(f"Violation Timeline - {student_id}")
-            plt.xlabel("Time")
-            plt.ylabel("Severity Level")
-            plt.grid(True, linestyle='--', alpha=0.7)
-            plt.xticks(rotation=45)
-            plt.tight_layout()
-
-            path = os.path.join(self.image_dir, f'timeline_{student_id}.png')
-            plt.savefig(path, dpi=150, bbox_inches='tight')
-            plt.close()
-            return path
-
+            return self.charts.timeline(violations, student_id)
         except Exception as e:
             self.logger.error(f"Failed to generate timeline: {e}")
             return None
@@ -215,47 +331,156 @@ class ReportGenerator:
         if not violations:
             return None
         try:
-            counts = {}
-            for v in violations:
-                counts[v['type']] = counts.get(v['type'], 0) + 1
-
+            counts = self.analyze(violations).counts()
             if not counts:
                 return None
 
-            types, values = zip(*sorted(counts.items(), key=lambda x: x[1], reverse=True))
-            colors = [plt.cm.Reds(self.severity_map.get(t, 1) / 5) for t in types]
+            return self.charts.heatmap(counts, student_id)
+        except Exception as e:
+            self.logger.error(f"Failed to generate heatmap: {e}")
+            return None
 
-            plt.figure(figsize=(10, 5))
-            bars = plt.barh(types, values, color=colors, edgecolor='black', linewidth=0.7)
 
-            for bar in bars:
-                width = bar.get_width()
-                plt.text(width + 0.3, bar.get_y() + bar.get_height() / 2, str(int(width)), va='center', ha='left', fontsize=10)
 
-            plt.title(f"Violation Frequency - {student_id}")
-            plt.xlabel("Count")
-            plt.ylabel("Violation Type")
-            plt.grid(True, linestyle='--', alpha=0.3, axis='x')
-            plt.tight_layout()
+class ReportJobQueue:
+    """
+    Generates reports on a small worker pool so Flask requests never wait on
+    matplotlib or PDF assembly.
+
+    Every job gets an ID whose status can be polled. Finished artefacts are
+    cached under `<output_dir>/cache`, keyed by student and violation-log
+    version, so asking again for an unchanged log returns a finished job
+    straight away; identical requests in flight share one job. The cache keeps
+    the `cache_size` most recently requested files; older ones are deleted
+    along with the jobs that point at them.
+    """
 
-            path = os.path.join(self.image_dir, f'heatmap_{student_id}.png')
-            plt.savefig(path, dpi=150, bbox_inches='tight')
-            plt.close()
-            return path
+    JOB_TTL = 3600  # seconds a finished job stays pollable
 
+    def __init__(self, config, generator):
+        self.generator = generator
+        self.cache_dir = os.path.join(generator.output_dir, 'cache')
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+        reporting_cfg = config.get('reporting', {})
+        self.cache_size = reporting_cfg.get('cache_size', 64)
+        workers = reporting_cfg.get('workers', 2)
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='report')
+        self.lock = threading.Lock()
+        self.jobs = {}
+        self.by_key = {}
+
+    def submit_pdf(self, student_info, violations):
+        """Queue (or reuse) the PDF report for this student and log version."""
+        student_id = str(student_info['id'])
+        version = violation_log_version(violations)
+        path = os.path.join(self.cache_dir, f"report_{student_id}_{version}.pdf")
+        return self.submit(('pdf', student_id, version), student_id, path,
+                           self.generator.generate_report_fpdf, student_info, violations, path)
+
+    def submit(self, key, student_id, path, fn, *args):
+        with self.lock:
+            self.prune()
+            job_id = self.by_key.get(key)
+            job = self.jobs.get(job_id)
+            if job and job['status'] != 'failed':
+                return dict(job)
+
+            job = {
+                'id': uuid.uuid4().hex,
+                'kind': key[0],
+                'student_id': student_id,
+                'status': 'queued',
+                'result': None,
+                'error': None,
+                'created': time.time(),
+                'finished': None,
+            }
+            if path and os.path.exists(path):
+                job.update(status='done', result=path, finished=time.time())
+                # Mark the cached file as recently used
+                os.utime(path)
+            self.jobs[job['id']] = job
+            self.by_key[key] = job['id']
+
+        if job['status'] == 'queued':
+            self.executor.submit(self.run, job['id'], fn, *args)
+        return dict(job)
+
+    def run(self, job_id, fn, *args):
+        with self.lock:
+            self.jobs[job_id]['status'] = 'running'
+        try:
+            result = fn(*args)
+            status, error = ('done', None) if result else ('failed', 'Report generation returned no output')
         except Exception as e:
-            self.logger.error(f"Failed to generate heatmap: {e}")
-            return None
+            result, status, error = None, 'failed', str(e)
+        with self.lock:
+            self.jobs[job_id].update(status=status, result=result, error=error, finished=time.time())
+            self.prune_cache()
 
+    def get(self, job_id):
+        with self.lock:
+            job = self.jobs.get(job_id)
+            return dict(job) if job else None
+
+    def prune(self):
+        cutoff = time.time() - self.JOB_TTL
+        stale = [job_id for job_id, job in self.jobs.items() if job['finished'] and job['finished'] < cutoff]
+        for job_id in stale:
+            del self.jobs[job_id]
+        self.by_key = {key: job_id for key, job_id in self.by_key.items() if job_id in self.jobs}
+
+    def prune_cache(self):
+        """Delete the least recently used cache files beyond `cache_size`; called with the lock held."""
+        try:
+            paths = [os.path.join(self.cache_dir, name) for name in os.listdir(self.cache_dir)]
+            paths.sort(key=os.path.getmtime, reverse=True)
+        except OSError as e:
+            print(f"[ReportJobQueue] Could not list the report cache: {e}")
+            return
+        removed = set()
+        for path in paths[self.cache_size:]:
+            try:
+                os.remove(path)
+                removed.add(path)
+            except OSError as e:
+                print(f"[ReportJobQueue] Could not remove {path}: {e}")
+        if removed:
+            self.jobs = {job_id: job for job_id, job in self.jobs.items() if job['result'] not in removed}
+            self.by_key = {key: job_id for key, job_id in self.by_key.items() if job_id in self.jobs}
 
 
 class ViolationLogger:
-    def __init__(self, config):
-        self.log_file = os.path.join(config['global']['output_path'], "violations.json")
+    """
+    Append-only JSON Lines journal of violations.
+
+    Entries are kept in memory and buffered; a background thread appends the
+    buffer to disk every `flush_interval` seconds, or sooner once `flush_size`
+    entries are waiting, so logging cost does not grow with the session length.
+    On load, a torn last line from a crash is skipped and the journal is
+    compacted; a legacy `violations*.json` array is migrated the same way.
+    """
+
+    def __init__(self, config, session_id=None):
+        journal_cfg = config.get('logging', {}).get('violation_journal', {})
+        self.flush_interval = journal_cfg.get('flush_interval', 1.0)
+        self.flush_size = journal_cfg.get('flush_size', 50)
+
+        basename = f"violations_{session_id}" if session_id else "violations"
+        self.log_file = os.path.join(config['global']['output_path'], f"{basename}.jsonl")
+        self.legacy_file = os.path.join(config['global']['output_path'], f"{basename}.json")
         os.makedirs(os.path.dirname(self.log_file), exist_ok=True)
+
+        self.lock = threading.Lock()
         self.violations = []
+        self.pending = []
+        self.listeners = []
+        self.stop_event = threading.Event()
+        self.flush_event = threading.Event()
+        self.thread = None
         self.load_from_file()
-        
+
     def log_violation(self, violation_type, timestamp=None, metadata=None):
         """Log a violation with optional timestamp and metadata."""
         entry = {
@@ -263,87 +488,435 @@ class ViolationLogger:
             'timestamp': timestamp or datetime.now().isoformat(),
             'metadata': metadata or {}
         }
-        self.violations.append(entry)
-        self.save_to_file()
-        
+        with self.lock:
+            self.violations.append(entry)
+            self.pending.append(entry)
+            pending = len(self.pending)
+
+        self.start_flusher()
+        if pending >= self.flush_size:
+            self.flush_event.set()
+
+        # Listeners run on the detection thread; a failing one (e.g. storage) must not end detection
+        for listener in self.listeners:
+            try:
+                listener(entry)
+            except Exception as e:
+                print(f"[ViolationLogger] Listener failed for {entry['type']}: {e}")
+
+    def add_listener(self, callback):
+        """Call callback(entry) for every violation logged from now on."""
+        self.listeners.append(callback)
+
+    def start_flusher(self):
+        if self.thread is None:
+            self.thread = threading.Thread(target=self.flush_loop, daemon=True)
+            self.thread.start()
+
+    def flush_loop(self):
+        while not self.stop_event.is_set():
+            self.flush_event.wait(self.flush_interval)
+            self.flush_event.clear()
+            self.save_to_file()
+
     def save_to_file(self):
-        """Persist violations to JSON file."""
-        with open(self.log_file, 'w') as f:
-            json.dump(self.violations, f, indent=2)
-            
+        """Append buffered violations to the journal."""
+        with self.lock:
+            batch, self.pending = self.pending, []
+        if not batch:
+            return
+        lines = ''.join(json.dumps(entry, default=str) + '\n' for entry in batch)
+        with open(self.log_file, 'a', encoding='utf-8') as f:
+            f.write(lines)
+            f.flush()
+            os.fsync(f.fileno())
+
+    def close(self):
+        """Stop the background flusher and write anything still buffered."""
+        self.stop_event.set()
+        self.flush_event.set()
+        if self.thread:
+            self.thread.join(timeout=2)
+            self.thread = None
+        self.save_to_file()
+
     def load_from_file(self):
-        """Load existing violations from JSON file if available."""
+        """Recover violations from the journal (or a legacy JSON array) if available."""
+        needs_compaction = False
+
         if os.path.exists(self.log_file):
+            with open(self.log_file, 'r', encoding='utf-8') as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        self.violations.append(json.loads(line))
+                    except json.JSONDecodeError:
+                        needs_compaction = True
+
+        if os.path.exists(self.legacy_file):
             try:
-                with open(self.log_file, 'r') as f:
-                    self.violations = json.load(f)
+                with open(self.legacy_file, 'r') as f:
+                    self.violations = json.load(f) + self.violations
+                needs_compaction = True
             except (json.JSONDecodeError, IOError):
-                self.violations = []
-                
+                pass
+
+        if needs_compaction:
+            self.compact()
+            if os.path.exists(self.legacy_file):
+                os.replace(self.legacy_file, self.legacy_file + '.migrated')
+
+    def compact(self):
+        """Atomically rewrite the journal from the in-memory entries."""
+        with self.lock:
+            entries = list(self.violations)
+            self.pending = []
+        tmp_file = self.log_file + '.tmp'
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            for entry in entries:
+                f.write(json.dumps(entry, default=str) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_file, self.log_file)
+
     def get_violations(self):
-        """Return the list of all logged violations."""
-        return self.violations
+        """Return a snapshot of all logged violations."""
+        with self.lock:
+            return list(self.violations)
+
+
+class ViolationEpisodeTracker:
+    """
+    Turns per-frame violation conditions into episodes.
+
+    An episode opens on the first frame a condition holds and stays open while
+    it keeps recurring; once the condition has been absent for `gap` seconds it
+    closes and on_end receives one episode with the real start, end, frame
+    count, peak confidence and the frame (and detector results) at that peak.
+    on_start fires when an episode opens, e.g. for an immediate spoken warning.
+    """
+
+    def __init__(self, config, on_start=None, on_end=None):
+        episodes_cfg = config.get('logging', {}).get('episodes', {})
+        self.gap = episodes_cfg.get('gap', 3.0)
+        self.min_duration = episodes_cfg.get('min_duration', 0.0)
+        self.on_start = on_start
+        self.on_end = on_end
+        self.open_episodes = {}
+
+    def update(self, violations, frame, results, now=None):
+        """violations maps each violation type holding on this frame to its confidence."""
+        now = now or datetime.now()
+
+        for violation_type, confidence in violations.items():
+            episode = self.open_episodes.get(violation_type)
+            if episode is None:
+                episode = {
+                    'type': violation_type,
+                    'start': now,
+                    'end': now,
+                    'frames': 0,
+                    'peak_confidence': -1.0,
+                    'frame': None,
+                    'results': None
+                }
+                self.open_episodes[violation_type] = episode
+                if self.on_start:
+                    self.on_start(episode)
+
+            episode['end'] = now
+            episode['frames'] += 1
+            if confidence > episode['peak_confidence']:
+                episode['peak_confidence'] = float(confidence)
+                episode['frame'] = frame
+                episode['results'] = dict(results)
+
+        for violation_type, episode in list(self.open_episodes.items()):
+            if violation_type not in violations and (now - episode['end']).total_seconds() > self.gap:
+                self.finish(violation_type)
+
+    def finish(self, violation_type):
+        episode = self.open_episodes.pop(violation_type)
+        duration = (episode['end'] - episode['start']).total_seconds()
+        if duration >= self.min_duration and self.on_end:
+            self.on_end(episode)
+
+    def close(self):
+        """Close every open episode, e.g. when the session ends."""
+        for violation_type in list(self.open_episodes):
+            self.finish(violation_type)
+
+    @staticmethod
+    def timestamp(episode):
+        return episode['start'].strftime("%Y%m%d_%H%M%S_%f")
+
+    @staticmethod
+    def metadata(episode, image_path=None):
+        return {
+            'start': episode['start'].isoformat(),
+            'end': episode['end'].isoformat(),
+            'duration': round((episode['end'] - episode['start']).total_seconds(), 2),
+            'frames': episode['frames'],
+            'peak_confidence': round(episode['peak_confidence'], 3),
+            'image_path': image_path,
+            'frame': episode['results']
+        }
 
 
 class VideoRecorder:
-    def __init__(self, config):
+    """
+    Records the webcam stream on its own encoder thread.
+
+    record_frame() only decides whether the frame is kept (frames beyond the
+    archival `fps` are skipped) and queues it; resizing to `scale`/`max_width`
+    and encoding with the configured `codec` happen on the writer thread. When
+    the bounded queue is full the frame is dropped and counted.
+
+    With `overlay: metadata` the raw frame is recorded and the detector
+    results are written to a `.overlay.jsonl` sidecar instead, one line per
+    change, keyed by recorded frame index, so they can be re-drawn on
+    playback. With `overlay: burn` the annotated frame is recorded as before.
+
+    If no codec can be opened, or writing fails, recording is disabled for the
+    rest of the session (`failed`) and further frames are ignored.
+    """
+
+    STOP_TIMEOUT = 5.0  # seconds to wait for the writer to drain on stop
+
+    def __init__(self, config, session_id=None):
         video_cfg = config['video']
+        recording_cfg = video_cfg.get('recording', {})
+        self.session_id = session_id
         self.recording_path = video_cfg['recording_path']
-        self.resolution = tuple(video_cfg['resolution'])
-        self.fps = video_cfg['fps']
+        self.codec = recording_cfg.get('codec', 'mp4v')
+        self.fallback_codec = 'mp4v'
+        self.container = recording_cfg.get('container', 'mp4')
+        self.fps = recording_cfg.get('fps') or video_cfg['fps']
+        self.scale = recording_cfg.get('scale', 1.0)
+        self.max_width = recording_cfg.get('max_width')
+        self.hw_acceleration = recording_cfg.get('hw_acceleration', False)
+        self.burn_overlay = recording_cfg.get('overlay', 'burn') != 'metadata'
+
+        self.queue = queue.Queue(maxsize=recording_cfg.get('queue_size', 30))
+        self.thread = None
         self.writer = None
         self.filename = None
-        self.frame_count = 0
+        self.overlay_file = None
+        self.resolution = None
+        self.active_codec = None
+        self.failed = False
         self.start_time = None
-        
+        self.next_frame_at = 0.0
+        self.queued = 0
+        self.frame_count = 0
+        self.encode_time = 0.0
+        self.dropped = {'fps_limit': 0, 'queue_full': 0}
+
     def start_recording(self):
         os.makedirs(self.recording_path, exist_ok=True)
-        
+
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        self.filename = os.path.join(self.recording_path, f"webcam_{timestamp}.mp4")
-        
-        fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-        self.writer = cv2.VideoWriter(self.filename, fourcc, self.fps, self.resolution)
-        
+        name = f"webcam_{self.session_id}_{timestamp}" if self.session_id else f"webcam_{timestamp}"
+        self.filename = os.path.join(self.recording_path, f"{name}.{self.container}")
+        self.overlay_file = None if self.burn_overlay else os.path.join(self.recording_path, f"{name}.overlay.jsonl")
+
+        self.queued = 0
         self.frame_count = 0
+        self.encode_time = 0.0
+        self.dropped = {'fps_limit': 0, 'queue_full': 0}
+        self.next_frame_at = 0.0
+        self.resolution = None
+        self.active_codec = None
+        self.writer = None
+        self.failed = False
         self.start_time = datetime.now()
-        
-    def record_frame(self, frame):
-        if self.writer is not None:
-            self.writer.write(frame)
-            self.frame_count += 1
-            
+        self.thread = threading.Thread(target=self.write_loop, name='video-recorder', daemon=True)
+        self.thread.start()
+
+    def record_frame(self, frame, results=None):
+        """
+        Queue a frame for encoding. In metadata mode pass the raw frame and its
+        results; the frame is copied because the caller draws on it afterwards.
+        """
+        if self.thread is None or self.failed:
+            return
+
+        now = time.monotonic()
+        if now < self.next_frame_at:
+            self.dropped['fps_limit'] += 1
+            return
+        self.next_frame_at = max(self.next_frame_at + 1.0 / self.fps, now)
+
+        if not self.burn_overlay:
+            frame = frame.copy()
+        try:
+            self.queue.put_nowait((frame, results))
+            self.queued += 1
+        except queue.Full:
+            self.dropped['queue_full'] += 1
+
+    def output_size(self, frame):
+        height, width = frame.shape[:2]
+        scale = self.scale
+        if self.max_width and width * scale > self.max_width:
+            scale = self.max_width / width
+        # Most codecs need even dimensions
+        return (int(width * scale) // 2 * 2, int(height * scale) // 2 * 2)
+
+    def open_writer(self, size):
+        params = []
+        if self.hw_acceleration and hasattr(cv2, 'VIDEOWRITER_PROP_HW_ACCELERATION'):
+            params = [cv2.VIDEOWRITER_PROP_HW_ACCELERATION, cv2.VIDEO_ACCELERATION_ANY]
+
+        for codec in dict.fromkeys([self.codec, self.fallback_codec]):
+            fourcc = cv2.VideoWriter_fourcc(*codec)
+            if params:
+                writer = cv2.VideoWriter(self.filename, cv2.CAP_FFMPEG, fourcc, self.fps, size, params)
+            else:
+                writer = cv2.VideoWriter(self.filename, fourcc, self.fps, size)
+            if writer.isOpened():
+                self.active_codec = codec
+                return writer
+            print(f"[VideoRecorder] Codec {codec} unavailable for {self.filename}")
+        return None
+
+    @staticmethod
+    def json_value(value):
+        # Detector results hold NumPy scalars
+        return value.item() if hasattr(value, 'item') else str(value)
+
+    def write_loop(self):
+        overlay = open(self.overlay_file, 'w', encoding='utf-8') if self.overlay_file else None
+        last_results = None
+        try:
+            while True:
+                item = self.queue.get()
+                if item is None:
+                    break
+                frame, results = item
+
+                started = time.perf_counter()
+                if self.writer is None:
+                    self.resolution = self.output_size(frame)
+                    self.writer = self.open_writer(self.resolution)
+                    if self.writer is None:
+                        print(f"[VideoRecorder] No usable codec, recording disabled for {self.filename}")
+                        self.failed = True
+                        break
+                if (frame.shape[1], frame.shape[0]) != self.resolution:
+                    frame = cv2.resize(frame, self.resolution, interpolation=cv2.INTER_AREA)
+                self.writer.write(frame)
+
+                if overlay and results is not None:
+                    state = {key: value for key, value in results.items() if key != 'timestamp'}
+                    if state != last_results:
+                        entry = {'frame': self.frame_count, 'time': results.get('timestamp'), 'results': state}
+                        overlay.write(json.dumps(entry, default=self.json_value) + '\n')
+                        last_results = state
+
+                self.frame_count += 1
+                self.encode_time += time.perf_counter() - started
+        except Exception as e:
+            print(f"[VideoRecorder] Failed to write {self.filename}: {e}")
+            self.failed = True
+        finally:
+            # The writer thread owns the VideoWriter, so it is never released mid-write
+            if self.writer is not None:
+                self.writer.release()
+                self.writer = None
+            if overlay:
+                overlay.close()
+
     def stop_recording(self):
-        if self.writer is None:
+        if self.thread is None:
             return None
-        
-        self.writer.release()
-        self.writer = None
-        
+
+        if self.thread.is_alive():
+            try:
+                self.queue.put(None, timeout=self.STOP_TIMEOUT)
+            except queue.Full:
+                print(f"[VideoRecorder] Encoder did not drain, abandoning queued frames for {self.filename}")
+        thread, self.thread = self.thread, None
+        thread.join(timeout=self.STOP_TIMEOUT)
+
+        # Frames a dead or abandoned writer will never take; a writer still busy gets a fresh stop marker
+        while True:
+            try:
+                self.queue.get_nowait()
+            except queue.Empty:
+                break
+        if thread.is_alive():
+            self.queue.put_nowait(None)
+
         duration = (datetime.now() - self.start_time).total_seconds() if self.start_time else 0
         actual_fps = self.frame_count / duration if duration > 0 else 0
-        
+
         return {
             'filename': self.filename,
+            'overlay_file': self.overlay_file,
+            'codec': self.active_codec,
+            'resolution': self.resolution,
             'frame_count': self.frame_count,
             'duration': duration,
-            'fps': actual_fps
+            'fps': actual_fps,
+            'dropped': dict(self.dropped)
         }
 
+    def stats(self):
+        return {
+            'recorded': self.frame_count,
+            'queued': self.queue.qsize(),
+            'avg_encode_ms': round(self.encode_time / self.frame_count * 1000, 2) if self.frame_count else 0,
+            'dropped': dict(self.dropped)
+        }
 
 
 class ViolationCapturer:
-    def __init__(self, config):
+    """
+    Saves annotated evidence images of violations on a background thread.
+
+    capture_violation() only enqueues the frame, so the detection loop never
+    waits on JPEG encoding or disk. Captures of the same violation type closer
+    together than `min_interval` seconds are skipped, and when the bounded
+    queue is full the new capture is dropped; both are counted in `dropped`.
+    Pass the violation's `when` (media time for recordings) so the interval is
+    measured in source time rather than wall time. With `block=True`, for
+    sources read faster than realtime, a full queue is waited on instead.
+    The frame must not be modified by the caller after it is handed over.
+    """
+
+    def __init__(self, config, session_id=None, block=False):
+        evidence_cfg = config.get('evidence', {})
+        self.jpeg_quality = evidence_cfg.get('jpeg_quality', 80)
+        self.max_width = evidence_cfg.get('max_width', 640)
+        self.min_interval = evidence_cfg.get('min_interval', 2.0)
+
         self.output_dir = os.path.join(config['global']['output_path'], "violation_captures")
+        self.session_id = session_id
         os.makedirs(self.output_dir, exist_ok=True)
 
+        self.queue = queue.Queue(maxsize=evidence_cfg.get('queue_size', 16))
+        self.block = block
+        self.last_capture = {}
+        self.written = 0
+        self.dropped = {'rate_limited': 0, 'queue_full': 0}
+        self.thread = None
+
     def generate_filename(self, violation_type, timestamp):
         """Generates a descriptive filename for the captured image."""
+        if self.session_id:
+            return f"{self.session_id}_{violation_type}_{timestamp}.jpg"
         return f"{violation_type}_{timestamp}.jpg"
 
     def draw_label(self, frame, text):
-        """Overlay violation label text on frame."""
-        labeled_frame = frame.copy()
+        """Overlay violation label text on a (downscaled) copy of the frame."""
+        height, width = frame.shape[:2]
+        if self.max_width and width > self.max_width:
+            labeled_frame = cv2.resize(frame, (self.max_width, int(height * self.max_width / width)))
+        else:
+            labeled_frame = frame.copy()
         cv2.putText(
             labeled_frame,
             text,
@@ -355,18 +928,33 @@ class ViolationCapturer:
         )
         return labeled_frame
 
-    def capture_violation(self, frame, violation_type, timestamp=None):
+    def capture_violation(self, frame, violation_type, timestamp=None, when=None):
         """
-        Saves an annotated image of the current frame upon violation.
-        Returns metadata including the saved path.
+        Queues an annotated image of the current frame for saving.
+        Returns metadata including the path it will be saved to, or None if the
+        capture was rate-limited or dropped.
         """
+        now = when.timestamp() if when else time.monotonic()
+        last = self.last_capture.get(violation_type)
+        if last is not None and now - last < self.min_interval:
+            self.dropped['rate_limited'] += 1
+            return None
+
         timestamp = timestamp or datetime.now().strftime("%Y%m%d_%H%M%S_%f")
-        label_text = f"{violation_type} - {timestamp}"
         filename = self.generate_filename(violation_type, timestamp)
         save_path = os.path.join(self.output_dir, filename)
 
-        labeled_frame = self.draw_label(frame, label_text)
-        cv2.imwrite(save_path, labeled_frame)
+        # Start the writer first so a blocking put always has a consumer
+        if self.thread is None:
+            self.thread = threading.Thread(target=self.write_loop, daemon=True)
+            self.thread.start()
+        try:
+            self.queue.put((frame, f"{violation_type} - {timestamp}", save_path), block=self.block)
+        except queue.Full:
+            self.dropped['queue_full'] += 1
+            return None
+
+        self.last_capture[violation_type] = now
 
         return {
             'type': violation_type,
@@ -374,6 +962,29 @@ class ViolationCapturer:
             'image_path': os.path.abspath(save_path)
         }
 
+    def write_loop(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                break
+            frame, label_text, save_path = item
+            try:
+                labeled_frame = self.draw_label(frame, label_text)
+                cv2.imwrite(save_path, labeled_frame, [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality])
+                self.written += 1
+            except Exception as e:
+                print(f"[ViolationCapturer] Failed to save {save_path}: {e}")
+
+    def close(self):
+        """Write out everything still queued and stop the writer thread."""
+        if self.thread:
+            self.queue.put(None)
+            self.thread.join(timeout=5)
+            self.thread = None
+
+    def stats(self):
+        return {'written': self.written, 'queued': self.queue.qsize(), 'dropped': dict(self.dropped)}
+
 
 class ScreenRecorder:
     def __init__(self, config):
@@ -394,6 +1005,8 @@ class ScreenRecorder:
 
     def get_monitor_config(self):
         """Determine which monitor to capture."""
+        from mss import mss
+
         self.sct = mss()
         monitors = self.sct.monitors
         index = self.monitor_index + 1  # mss.monitor[0] is a virtual monitor (all screens)
@@ -428,6 +1041,8 @@ class ScreenRecorder:
 
     def capture_loop(self):
         """Continuously capture and write frames in a background thread."""
+        from mss import mss
+
         self.sct = mss()  # Must be initialized in the thread
 
         while not self.stop_event.is_set():
@@ -461,51 +1076,196 @@ class ScreenRecorder:
 
 
 class AlertLogger:
-    def __init__(self, config):
+    """
+    Thread-safe alert log used by the detector, audio and pipeline threads.
+
+    log_alert() only appends to a bounded in-memory ring of recent alerts and
+    a queue; a background thread writes queued entries to the log file in one
+    batch every `flush_interval` seconds, or sooner once `flush_size` are
+    waiting. The file is rotated by size (`max_bytes`) and age
+    (`rotate_interval`), keeping `backup_count` old files. stats() reports
+    flush latency.
+    """
+
+    def __init__(self, config, session_id=None):
         self.log_path = config['logging']['log_path']
         self.cooldown = config['logging']['alert_cooldown']
+        alert_log_cfg = config['logging'].get('alert_log', {})
+        self.flush_interval = alert_log_cfg.get('flush_interval', 1.0)
+        self.flush_size = alert_log_cfg.get('flush_size', 100)
+        self.max_bytes = alert_log_cfg.get('max_bytes', 5 * 1024 * 1024)
+        self.rotate_interval = alert_log_cfg.get('rotate_interval', 24 * 3600)
+        self.backup_count = alert_log_cfg.get('backup_count', 5)
+
+        self.lock = threading.Lock()
         self.last_alert_time = {}
-        self.alerts = []
+        self.alerts = deque(maxlen=alert_log_cfg.get('max_recent', 500))
+        self.listeners = []
 
         os.makedirs(self.log_path, exist_ok=True)
-        self.log_file = os.path.join(self.log_path, "alerts.log")
+        filename = f"alerts_{session_id}.log" if session_id else "alerts.log"
+        self.log_file = os.path.join(self.log_path, filename)
+        self.segment_started = os.path.getmtime(self.log_file) if os.path.exists(self.log_file) else time.time()
+
+        self.queue = queue.Queue()
+        self.flush_event = threading.Event()
+        self.stop_event = threading.Event()
+        self.thread = None
+
+        self.written = 0
+        self.flushes = 0
+        self.last_flush_ms = 0.0
+        self.max_flush_ms = 0.0
 
     def within_cooldown(self, alert_type, now_ts):
         """Check if alert type is still in cooldown period."""
         last_ts = self.last_alert_time.get(alert_type)
         return last_ts is not None and (now_ts - last_ts) < self.cooldown
 
-    def write_to_file(self, entry):
-        """Safely append a log entry to file."""
-        try:
-            with open(self.log_file, "a", encoding="utf-8") as f:
-                f.write(entry + "\n")
-        except Exception as e:
-            print(f"[AlertLogger] Failed to write to log file: {e}")
-
     def log_alert(self, alert_type, message):
         """Log an alert if it's outside its cooldown window."""
         now = datetime.now()
         now_ts = now.timestamp()
 
-        if self.within_cooldown(alert_type, now_ts):
-            return None
+        with self.lock:
+            if self.within_cooldown(alert_type, now_ts):
+                return None
+            self.last_alert_time[alert_type] = now_ts
+
+            timestamp = now.strftime("%Y-%m-%d %H:%M:%S")
+            entry = f"{timestamp} - {alert_type.upper()}: {message}"
+            self.alerts.append(entry)
+
+        self.queue.put(entry)
+        if self.thread is None:
+            self.start_flusher()
+        if self.queue.qsize() >= self.flush_size:
+            self.flush_event.set()
 
-        self.last_alert_time[alert_type] = now_ts
-        timestamp = now.strftime("%Y-%m-%d %H:%M:%S")
-        entry = f"{timestamp} - {alert_type.upper()}: {message}"
-        self.alerts.append(entry)
-        self.write_to_file(entry)
+        for listener in self.listeners:
+            listener(alert_type.upper(), message, now)
 
         return entry
 
+    def add_listener(self, callback):
+        """Call callback(alert_type, message, time) for every alert that passes the cooldown."""
+        self.listeners.append(callback)
+
+    def start_flusher(self):
+        with self.lock:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.flush_loop, daemon=True)
+                self.thread.start()
+
+    def flush_loop(self):
+        while not self.stop_event.is_set():
+            self.flush_event.wait(self.flush_interval)
+            self.flush_event.clear()
+            self.flush()
+
+    def flush(self):
+        """Write every queued entry to the log file in one append."""
+        entries = []
+        while True:
+            try:
+                entries.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+        if not entries:
+            return
+
+        started = time.monotonic()
+        data = ''.join(entry + "\n" for entry in entries)
+        try:
+            if self.should_rotate(len(data)):
+                self.rotate()
+            with open(self.log_file, "a", encoding="utf-8") as f:
+                f.write(data)
+        except Exception as e:
+            print(f"[AlertLogger] Failed to write to log file: {e}")
+            return
+
+        elapsed_ms = (time.monotonic() - started) * 1000
+        self.written += len(entries)
+        self.flushes += 1
+        self.last_flush_ms = elapsed_ms
+        self.max_flush_ms = max(self.max_flush_ms, elapsed_ms)
+
+    def should_rotate(self, incoming_bytes):
+        if not os.path.exists(self.log_file):
+            return False
+        if self.max_bytes and os.path.getsize(self.log_file) + incoming_bytes > self.max_bytes:
+            return True
+        return bool(self.rotate_interval) and time.time() - self.segment_started > self.rotate_interval
+
+    def rotate(self):
+        """alerts.log -> alerts.log.1 -> ... -> alerts.log.<backup_count> (oldest dropped)."""
+        for index in range(self.backup_count - 1, 0, -1):
+            src = f"{self.log_file}.{index}"
+            if os.path.exists(src):
+                os.replace(src, f"{self.log_file}.{index + 1}")
+        if self.backup_count:
+            os.replace(self.log_file, f"{self.log_file}.1")
+        else:
+            os.remove(self.log_file)
+        self.segment_started = time.time()
+
+    def close(self):
+        """Stop the flusher and write anything still queued."""
+        self.stop_event.set()
+        self.flush_event.set()
+        if self.thread:
+            self.thread.join(timeout=2)
+            self.thread = None
+        self.flush()
+
+    def recent_alerts(self):
+        with self.lock:
+            return list(self.alerts)
+
+    def stats(self):
+        return {
+            'written': self.written,
+            'queued': self.queue.qsize(),
+            'flushes': self.flushes,
+            'last_flush_ms': round(self.last_flush_ms, 2),
+            'max_flush_ms': round(self.max_flush_ms, 2),
+        }
+
 
 class AlertSystem:
+    """
+    Speaks the fixed alert phrases through one long-lived playback thread.
+
+    On startup the worker loads each phrase once: from `voice_dir/<ALERT_TYPE>.(wav|ogg|mp3)`
+    if supplied, otherwise from `cache_dir/<sha1 of phrase>.mp3`, synthesising
+    that file with gTTS only when it is not cached yet. Sounds are then played
+    from memory in priority order, so an alert costs no network, disk or new
+    thread, and cached phrases keep working offline.
+    """
+
+    PRIORITIES = {
+        "MULTIPLE_FACES": 0,
+        "OBJECT_DETECTED": 0,
+        "SPEECH_VIOLATION": 1,
+        "FACE_DISAPPEARED": 1,
+        "VOICE_DETECTED": 2,
+        "MOUTH_MOVING": 2,
+        "GAZE_AWAY": 2,
+        "FACE_REAPPEARED": 3,
+    }
+    LOCAL_EXTENSIONS = ('.wav', '.ogg', '.mp3')
+
     def __init__(self, config):
-        pygame.mixer.init()
         self.config = config
         self.alert_cooldown = config['logging']['alert_cooldown']
+        alert_cfg = config['logging'].get('alert_system', {})
+        self.enabled = alert_cfg.get('voice_alerts', True)
+        self.volume = alert_cfg.get('alert_volume', 0.8)
+        self.cache_dir = alert_cfg.get('cache_dir', './assets/alerts/cache')
+        self.voice_dir = alert_cfg.get('voice_dir', './assets/alerts')
         self.last_alert_time = {}
+        self.lock = threading.Lock()
 
         self.alerts = {
             "FACE_DISAPPEARED": "Please look at the screen",
@@ -518,6 +1278,15 @@ class AlertSystem:
             "VOICE_DETECTED": "We detected voice, please maintain silence during the exam",
         }
 
+        self.sounds = {}
+        self.ready = threading.Event()
+        self.queue = queue.PriorityQueue()
+        self.sequence = 0
+        self.thread = None
+        if self.enabled:
+            self.thread = threading.Thread(target=self.playback_loop, daemon=True)
+            self.thread.start()
+
     def can_trigger(self, alert_type):
         """Returns True if the cooldown period has passed."""
         now = time.time()
@@ -528,29 +1297,71 @@ class AlertSystem:
         """Update last alert timestamp."""
         self.last_alert_time[alert_type] = time.time()
 
-    def speak_alert(self, alert_type):
-        """Convert alert message to speech and play it (non-blocking)."""
-        if alert_type not in self.alerts or not self.can_trigger(alert_type):
-            return
+    def cached_path(self, message):
+        digest = hashlib.sha1(f"en:{message}".encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir, f"{digest}.mp3")
+
+    def resolve_audio_file(self, alert_type, message):
+        """Local voice file if supplied, else the cached (and if needed, synthesised) MP3."""
+        for ext in self.LOCAL_EXTENSIONS:
+            local_path = os.path.join(self.voice_dir, f"{alert_type}{ext}")
+            if os.path.exists(local_path):
+                return local_path
+
+        path = self.cached_path(message)
+        if not os.path.exists(path):
+            os.makedirs(self.cache_dir, exist_ok=True)
+            tmp_path = path + '.tmp'
+            from gtts import gTTS
+
+            gTTS(text=message, lang='en').save(tmp_path)
+            os.replace(tmp_path, path)
+        return path
+
+    def load_sounds(self):
+        """Open the mixer and load every phrase (on the playback thread, so startup never waits on audio)."""
+        try:
+            import pygame
 
-        self.log_alert_time(alert_type)
-        message = self.alerts[alert_type]
+            pygame.mixer.init()
+        except Exception as e:
+            print(f"[AlertSystem] No audio device, voice alerts disabled: {e}")
+            self.ready.set()
+            return
 
-        def _play():
+        for alert_type, message in self.alerts.items():
+            try:
+                sound = pygame.mixer.Sound(self.resolve_audio_file(alert_type, message))
+                sound.set_volume(self.volume)
+                self.sounds[alert_type] = sound
+            except Exception as e:
+                print(f"[AlertSystem] No audio for {alert_type}: {e}")
+        self.ready.set()
+
+    def playback_loop(self):
+        self.load_sounds()
+        while True:
+            _, _, alert_type = self.queue.get()
+            sound = self.sounds.get(alert_type)
+            if sound is None:
+                continue
             try:
-                tts = gTTS(text=message, lang='en')
-                with tempfile.NamedTemporaryFile(suffix='.mp3', delete=False) as tmp_file:
-                    temp_path = tmp_file.name
-                    tts.save(temp_path)
-
-                pygame.mixer.music.load(temp_path)
-                pygame.mixer.music.play()
-                while pygame.mixer.music.get_busy():
-                    time.sleep(0.1)
+                channel = sound.play()
+                while channel is not None and channel.get_busy():
+                    time.sleep(0.05)
             except Exception as e:
                 print(f"[AlertSystem] Audio playback failed: {e}")
-            finally:
-                if 'temp_path' in locals() and os.path.exists(temp_path):
-                    os.unlink(temp_path)
 
-        threading.Thread(target=_play, daemon=True).start()
+    def speak_alert(self, alert_type):
+        """Queue the alert's pre-rendered audio for playback (non-blocking)."""
+        if not self.enabled or alert_type not in self.alerts:
+            return
+
+        with self.lock:
+            if not self.can_trigger(alert_type):
+                return
+            self.log_alert_time(alert_type)
+            self.sequence += 1
+            sequence = self.sequence
+
+        self.queue.put((self.PRIORITIES.get(alert_type, 2), sequence, alert_type))
@@ -0,0 +1,277 @@
+import threading
+import time
+from collections import deque
+
+import psutil
+
+from detection_system import EyeTracker, FaceDetectionStage, FaceDetector, FaceMeshStage, MouthMonitor, ObjectDetector, MultiFaceDetector
+from report import AlertLogger, VideoRecorder, ViolationLogger, ViolationCapturer, ViolationEpisodeTracker
+from pipeline import DetectionPipeline, display_detection_results
+from sources import open_frame_source
+
+
+class SessionLimitError(RuntimeError):
+    """Raised when a new session would exceed the configured session or memory limits."""
+
+
+class SourceUnavailableError(RuntimeError):
+    """Raised when a new session's frame source (camera, stream or file) cannot be opened."""
+
+
+class EventFeed:
+    """
+    Ring buffer of numbered session events (alerts, violations) that push
+    endpoints can wait on and resume from by event ID.
+    """
+
+    def __init__(self, max_events=200):
+        self.events = deque(maxlen=max_events)
+        self.last_id = 0
+        self.closed = False
+        self.condition = threading.Condition()
+
+    def publish(self, kind, data):
+        with self.condition:
+            self.last_id += 1
+            self.events.append((self.last_id, kind, data))
+            self.condition.notify_all()
+
+    def close(self):
+        """Wake every waiting subscriber; streams end once the session is gone."""
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+
+    def events_after(self, last_id):
+        # A client ahead of us saw a previous session with the same key; replay from the start
+        if last_id > self.last_id:
+            last_id = 0
+        return [event for event in self.events if event[0] > last_id]
+
+    def wait(self, last_id, timeout=15):
+        """Return events newer than last_id, blocking up to timeout seconds for the first one."""
+        with self.condition:
+            events = self.events_after(last_id)
+            if not events and not self.closed:
+                self.condition.wait(timeout)
+                events = self.events_after(last_id)
+            return events
+
+
+def session_key(student_id, exam_id):
+    return f"{student_id}_{exam_id}"
+
+
+class ProctoringSession:
+    """
+    Everything that belongs to one student's exam: frame source, detector
+    state, recorder, violation log and alert log. Nothing here is shared with
+    other sessions except the (thread-safe) AlertSystem and inference servers.
+    """
+
+    def __init__(self, config, student_id, exam_id, source=None, alert_system=None, inference=None, store=None):
+        self.config = config
+        self.student_id = student_id
+        self.exam_id = exam_id
+        self.key = session_key(student_id, exam_id)
+        self.alert_system = alert_system
+        self.store = store
+        # Database IDs are checked here, on the request thread, not at the first violation on the detect thread
+        self.store_ids = (int(student_id), int(exam_id)) if store else None
+
+        # Open the source first so a busy or missing camera leaves nothing else running
+        self.cap = open_frame_source(config, source)
+        if not self.cap.isOpened():
+            self.cap.release()
+            raise SourceUnavailableError(f"Could not open video source {config['video']['source'] if source is None else source}")
+
+        self.alert_logger = AlertLogger(config, session_id=self.key)
+        self.logger = ViolationLogger(config, session_id=self.key)
+        self.capturer = ViolationCapturer(config, session_id=self.key, block=not self.cap.realtime)
+        self.video_recorder = VideoRecorder(config, session_id=self.key)
+        self.episodes = ViolationEpisodeTracker(config, on_start=self.start_episode, on_end=self.record_episode)
+
+        self.face_mesh = FaceMeshStage(config)
+        self.face_detection = FaceDetectionStage(config, server=inference.faces if inference else None)
+        self.detectors = [
+            FaceDetector(config),
+            EyeTracker(config),
+            MouthMonitor(config),
+            MultiFaceDetector(config),
+            ObjectDetector(config, server=inference.objects if inference else None)
+        ]
+        for stage in [self.face_mesh, self.face_detection] + self.detectors:
+            stage.set_alert_logger(self.alert_logger)
+
+        self.events = EventFeed(config.get('sessions', {}).get('max_events', 200))
+        self.alert_logger.add_listener(self.publish_alert)
+        self.logger.add_listener(self.publish_violation)
+        if store:
+            self.logger.add_listener(self.persist_violation)
+
+        self.pipeline = DetectionPipeline(
+            config, self.cap, self.face_detection, self.face_mesh, self.detectors,
+            on_violations=self.episodes.update,
+            annotate=display_detection_results,
+            video_recorder=self.video_recorder
+        )
+
+        self.created_at = time.monotonic()
+        self.last_active = self.created_at
+
+    def publish_alert(self, alert_type, message, when):
+        self.events.publish('alert', {
+            'type': alert_type,
+            'message': message,
+            'time': when.isoformat()
+        })
+
+    def publish_violation(self, entry):
+        metadata = entry.get('metadata', {})
+        self.events.publish('violation', {
+            'type': entry['type'],
+            'timestamp': entry['timestamp'],
+            'duration': metadata.get('duration'),
+            'peak_confidence': metadata.get('peak_confidence')
+        })
+
+    def persist_violation(self, entry):
+        self.store.add_violation(*self.store_ids, entry)
+
+    def start_episode(self, episode):
+        if self.alert_system:
+            self.alert_system.speak_alert(episode['type'])
+        self.events.publish('violation_started', {
+            'type': episode['type'],
+            'time': episode['start'].isoformat()
+        })
+
+    def record_episode(self, episode):
+        """Save one evidence image and one journal entry for a finished episode."""
+        timestamp = ViolationEpisodeTracker.timestamp(episode)
+        capture = self.capturer.capture_violation(episode['frame'], episode['type'], timestamp, when=episode['start'])
+        self.logger.log_violation(
+            episode['type'], timestamp,
+            ViolationEpisodeTracker.metadata(episode, capture['image_path'] if capture else None)
+        )
+
+    def start(self):
+        self.pipeline.start()
+
+    @property
+    def ended(self):
+        return self.pipeline.ended
+
+    def touch(self):
+        self.last_active = time.monotonic()
+
+    def frames(self):
+        for item in self.pipeline.frames():
+            self.touch()
+            yield item
+
+    def close(self):
+        """Stop the pipeline, release the camera and return the recording metadata."""
+        recording = self.pipeline.stop()
+        if self.cap and self.cap.isOpened():
+            self.cap.release()
+        self.episodes.close()
+        self.capturer.close()
+        self.logger.close()
+        self.alert_logger.close()
+        self.events.close()
+        if self.store and recording:
+            self.store.add_recording(*self.store_ids, video_path=recording['filename'])
+        return recording
+
+
+class SessionManager:
+    """
+    Creates and tracks one ProctoringSession per (student, exam) pair.
+
+    New sessions are refused with SessionLimitError once `max_sessions` are
+    running or the process RSS exceeds `max_memory_mb`, and with
+    SourceUnavailableError when the frame source cannot be opened. Sessions
+    whose source has ended, or that have had no viewer for `idle_timeout`
+    seconds, are closed; asking for an ended session again starts a new one.
+    """
+
+    def __init__(self, config, alert_system=None, inference=None, store=None):
+        sessions_cfg = config.get('sessions', {})
+        self.max_sessions = sessions_cfg.get('max_sessions', 20)
+        self.max_memory_mb = sessions_cfg.get('max_memory_mb', 0)
+        self.idle_timeout = sessions_cfg.get('idle_timeout', 120)
+
+        self.config = config
+        self.alert_system = alert_system
+        self.inference = inference
+        self.store = store
+
+        self.lock = threading.Lock()
+        self.sessions = {}
+
+    def memory_mb(self):
+        return psutil.Process().memory_info().rss / (1024 * 1024)
+
+    def check_limits(self):
+        if len(self.sessions) >= self.max_sessions:
+            raise SessionLimitError(f"Session limit reached ({self.max_sessions} active sessions)")
+        if self.max_memory_mb and self.memory_mb() >= self.max_memory_mb:
+            raise SessionLimitError(f"Memory limit reached ({self.max_memory_mb} MB)")
+
+    def get(self, student_id, exam_id):
+        with self.lock:
+            return self.sessions.get(session_key(student_id, exam_id))
+
+    def student_ids(self, exam_id):
+        """Students with a live session for this exam."""
+        with self.lock:
+            return [s.student_id for s in self.sessions.values() if str(s.exam_id) == str(exam_id) and not s.ended]
+
+    def get_or_create(self, student_id, exam_id, source=None):
+        self.close_idle()
+        key = session_key(student_id, exam_id)
+        with self.lock:
+            session = self.sessions.get(key)
+            if session is None:
+                self.check_limits()
+                session = ProctoringSession(
+                    self.config, student_id, exam_id, source=source,
+                    alert_system=self.alert_system, inference=self.inference, store=self.store
+                )
+                self.sessions[key] = session
+            session.touch()
+            return session
+
+    def close(self, student_id, exam_id):
+        with self.lock:
+            session = self.sessions.pop(session_key(student_id, exam_id), None)
+        return session.close() if session else None
+
+    def close_idle(self):
+        """Close sessions whose source has ended or that have been idle for `idle_timeout` seconds."""
+        now = time.monotonic()
+        with self.lock:
+            idle = [
+                key for key, s in self.sessions.items()
+                if s.ended or (self.idle_timeout and now - s.last_active > self.idle_timeout)
+            ]
+            closing = [self.sessions.pop(key) for key in idle]
+        for session in closing:
+            session.close()
+
+    def close_all(self):
+        with self.lock:
+            closing = list(self.sessions.values())
+            self.sessions.clear()
+        for session in closing:
+            session.close()
+
+    def stats(self):
+        with self.lock:
+            return {
+                'active_sessions': len(self.sessions),
+                'max_sessions': self.max_sessions,
+                'memory_mb': round(self.memory_mb(), 1),
+                'max_memory_mb': self.max_memory_mb,
+            }
@@ -0,0 +1,261 @@
+import glob
+import os
+import re
+import time
+import wave
+from datetime import datetime, timedelta
+
+import cv2
+import numpy as np
+
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+
+
+class Pacer:
+    """Sleeps so items come out at `rate` per second of wall time; does nothing when disabled."""
+
+    def __init__(self, rate, enabled=True):
+        self.interval = 1.0 / rate if rate else 0.0
+        self.enabled = enabled and self.interval > 0
+        self.next_at = None
+
+    def wait(self):
+        if not self.enabled:
+            return
+        now = time.monotonic()
+        if self.next_at is None:
+            self.next_at = now
+        elif self.next_at > now:
+            time.sleep(self.next_at - now)
+        # After a stall, carry on at the normal pace instead of bursting to catch up
+        self.next_at = max(self.next_at + self.interval, time.monotonic() - self.interval)
+
+
+class FrameSource:
+    """
+    cv2.VideoCapture-style frame source: read() -> (ok, frame), release(),
+    isOpened(). `frame_time` is the capture time of the last frame (media
+    time for recordings) and `realtime` says whether frames arrive at their
+    natural pace; when False the pipeline applies backpressure instead of
+    dropping frames.
+    """
+
+    realtime = True
+
+    def __init__(self):
+        self.frame_time = None
+        self.frames_read = 0
+
+    def read(self):
+        raise NotImplementedError
+
+    def release(self):
+        pass
+
+    def isOpened(self):
+        return True
+
+
+class LiveCamera(FrameSource):
+    """Webcam index or network stream."""
+
+    def __init__(self, source, resolution=None):
+        super().__init__()
+        self.cap = cv2.VideoCapture(source)
+        if resolution:
+            self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, resolution[0])
+            self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, resolution[1])
+
+    def read(self):
+        ret, frame = self.cap.read()
+        if ret:
+            self.frame_time = datetime.now()
+            self.frames_read += 1
+        return ret, frame
+
+    def release(self):
+        self.cap.release()
+
+    def isOpened(self):
+        return self.cap.isOpened()
+
+
+class VideoFileSource(FrameSource):
+    """
+    Recorded video. Frames are paced to the file's frame rate in realtime
+    mode, or returned as fast as they are read otherwise. With frame_step > 1
+    only every n-th frame is decoded; the others are skipped with grab().
+    """
+
+    def __init__(self, path, realtime=True, frame_step=1, start_time=None):
+        super().__init__()
+        self.path = path
+        self.realtime = realtime
+        self.frame_step = max(1, int(frame_step))
+        self.cap = cv2.VideoCapture(path)
+        self.fps = self.cap.get(cv2.CAP_PROP_FPS) or 30.0
+        self.frame_count = int(self.cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
+        self.start_time = start_time or self.recording_start(path, self.frame_count / self.fps)
+        self.index = -1
+        self.pacer = Pacer(self.fps / self.frame_step, realtime)
+
+    @staticmethod
+    def recording_start(path, duration):
+        """Start time from a VideoRecorder name (..._YYYYmmdd_HHMMSS.mp4), else file mtime minus duration."""
+        match = re.search(r'_(\d{8}_\d{6})\.\w+$', os.path.basename(path))
+        if match:
+            return datetime.strptime(match.group(1), "%Y%m%d_%H%M%S")
+        if os.path.exists(path):
+            return datetime.fromtimestamp(os.path.getmtime(path)) - timedelta(seconds=duration)
+        return datetime.now()
+
+    def read(self):
+        for _ in range(self.frame_step - 1):
+            if not self.cap.grab():
+                return False, None
+            self.index += 1
+
+        ret, frame = self.cap.read()
+        if not ret:
+            return False, None
+        self.index += 1
+        self.frames_read += 1
+        self.frame_time = self.start_time + timedelta(seconds=self.index / self.fps)
+        self.pacer.wait()
+        return True, frame
+
+    def release(self):
+        self.cap.release()
+
+    def isOpened(self):
+        return self.cap.isOpened()
+
+
+class ImageSequenceSource(FrameSource):
+    """A directory or glob of still images, read in name order at `fps`."""
+
+    def __init__(self, pattern, fps=30, realtime=True, start_time=None):
+        super().__init__()
+        if os.path.isdir(pattern):
+            self.files = sorted(
+                path for path in glob.glob(os.path.join(pattern, '*'))
+                if path.lower().endswith(IMAGE_EXTENSIONS)
+            )
+        else:
+            self.files = sorted(glob.glob(pattern))
+        self.fps = fps
+        self.realtime = realtime
+        self.start_time = start_time or datetime.now()
+        self.index = 0
+        self.pacer = Pacer(fps, realtime)
+
+    def read(self):
+        while self.index < len(self.files):
+            path = self.files[self.index]
+            self.index += 1
+            frame = cv2.imread(path)
+            if frame is None:
+                print(f"[ImageSequenceSource] Skipping unreadable image {path}")
+                continue
+            self.frames_read += 1
+            self.frame_time = self.start_time + timedelta(seconds=(self.index - 1) / self.fps)
+            self.pacer.wait()
+            return True, frame
+        return False, None
+
+    def isOpened(self):
+        return bool(self.files)
+
+
+def open_frame_source(config, source=None):
+    """
+    Build the frame source for `video.source` (or an explicit source): a camera
+    index or stream URL is live; a directory or glob is an image sequence; any
+    other path is a video file. `video.playback: fast` reads files as fast as
+    detection allows instead of at their frame rate.
+    """
+    video_cfg = config['video']
+    source = video_cfg['source'] if source is None else source
+    realtime = video_cfg.get('playback', 'realtime') != 'fast'
+
+    if isinstance(source, int) or str(source).isdigit():
+        return LiveCamera(int(source), video_cfg.get('resolution'))
+    source = str(source)
+    if re.match(r'^[a-z]+://', source):
+        return LiveCamera(source, video_cfg.get('resolution'))
+    if os.path.isdir(source) or any(char in source for char in '*?['):
+        return ImageSequenceSource(source, video_cfg['fps'], realtime)
+    return VideoFileSource(source, realtime, frame_step=video_cfg.get('frame_step', 1))
+
+
+class AudioSource:
+    """read(n) -> int16 samples (None at end of stream), close(), `realtime` as for frames."""
+
+    realtime = True
+
+    def read(self, frames):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class MicrophoneSource(AudioSource):
+    """Default input device through PyAudio."""
+
+    def __init__(self, sample_rate, chunk_size):
+        # Imported here so file and benchmark runs work on hosts without PortAudio
+        import pyaudio
+
+        self.pyaudio = pyaudio.PyAudio()
+        self.stream = self.pyaudio.open(
+            format=pyaudio.paInt16,
+            channels=1,
+            rate=sample_rate,
+            input=True,
+            frames_per_buffer=chunk_size
+        )
+
+    def read(self, frames):
+        data = self.stream.read(frames, exception_on_overflow=False)
+        return np.frombuffer(data, dtype=np.int16)
+
+    def close(self):
+        self.stream.stop_stream()
+        self.stream.close()
+        self.pyaudio.terminate()
+
+
+class WavFileSource(AudioSource):
+    """Mono 16-bit PCM WAV file, paced to its sample rate in realtime mode."""
+
+    def __init__(self, path, sample_rate, chunk_size, realtime=True):
+        self.wav = wave.open(path, 'rb')
+        if self.wav.getnchannels() != 1 or self.wav.getsampwidth() != 2:
+            self.wav.close()
+            raise ValueError(f"{path}: expected mono 16-bit PCM")
+        if self.wav.getframerate() != sample_rate:
+            self.wav.close()
+            raise ValueError(f"{path}: expected {sample_rate} Hz, got {self.wav.getframerate()}")
+        self.realtime = realtime
+        self.pacer = Pacer(sample_rate / chunk_size, realtime)
+
+    def read(self, frames):
+        data = self.wav.readframes(frames)
+        if not data:
+            return None
+        self.pacer.wait()
+        return np.frombuffer(data, dtype=np.int16)
+
+    def close(self):
+        self.wav.close()
+
+
+def open_audio_source(audio_cfg, chunk_size):
+    """`source: microphone` (default) or a WAV path, with `playback` as for video."""
+    source = audio_cfg.get('source', 'microphone')
+    if source == 'microphone':
+        return MicrophoneSource(audio_cfg['sample_rate'], chunk_size)
+    realtime = audio_cfg.get('playback', 'realtime') != 'fast'
+    return WavFileSource(source, audio_cfg['sample_rate'], chunk_size, realtime)
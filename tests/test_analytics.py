@@ -0,0 +1,39 @@
+import numpy as np
+import pytest
+
+from analytics import parse_timestamp, parse_timestamps
+
+
+def scalar(timestamp):
+    try:
+        return np.datetime64(parse_timestamp(timestamp), 'us')
+    except (TypeError, ValueError):
+        return np.datetime64('NaT')
+
+
+def test_parse_timestamps_matches_scalar_parser():
+    timestamps = [
+        "20250101_120000_000000",
+        "20240229_235959_999999",
+        "2025-01-01T12:00:00.500000",
+        "not a timestamp",
+    ]
+    expected = np.array([scalar(t) for t in timestamps], dtype='datetime64[us]')
+    np.testing.assert_array_equal(parse_timestamps(timestamps), expected)
+
+
+@pytest.mark.parametrize('timestamp', [
+    "20251301_120000_000000",  # month 13
+    "20250001_120000_000000",  # month 0
+    "20250230_120000_000000",  # 30 February
+    "20250100_120000_000000",  # day 0
+    "20250101_240000_000000",  # hour 24
+    "20250101_126000_000000",  # minute 60
+    "20250101_120060_000000",  # second 60
+    "00000101_120000_000000",  # year 0
+])
+def test_parse_timestamps_rejects_out_of_range_fields(timestamp):
+    parsed = parse_timestamps(["20250101_120000_000000", timestamp])
+    assert parsed[0] == np.datetime64('2025-01-01T12:00:00', 'us')
+    assert np.isnat(parsed[1])
+    assert np.isnat(scalar(timestamp))
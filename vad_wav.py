@@ -0,0 +1,38 @@
+"""
+Run the AudioMonitor voice activity detector over WAV files offline.
+
+    python vad_wav.py recording.wav [more.wav ...]
+
+Files must be mono 16-bit PCM at the configured sample rate. Prints one line
+per detected utterance, using the thresholds and `vad` settings from
+config.yaml.
+"""
+import sys
+import time
+
+import yaml
+
+from detection_system import VoiceActivityDetector
+
+
+def main(paths):
+    with open('config.yaml') as f:
+        cfg = yaml.safe_load(f)['detection']['audio_monitoring']
+
+    vad = VoiceActivityDetector(cfg.get('vad', {}), cfg['energy_threshold'], cfg['zcr_threshold'], cfg['sample_rate'])
+    for path in paths:
+        started = time.perf_counter()
+        events = vad.detect_file(path)
+        elapsed = time.perf_counter() - started
+
+        utterances = [event for event in events if event['event'] == 'end']
+        print(f"{path}: {len(utterances)} utterances, {vad.position / vad.sample_rate:.1f}s audio in {elapsed * 1000:.0f} ms")
+        for event in utterances:
+            print(f"  {event['start']:8.2f}s - {event['end']:8.2f}s  ({event['duration']:.2f}s)")
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        print(__doc__)
+        sys.exit(1)
+    main(sys.argv[1:])